@@ -0,0 +1,261 @@
+import asyncio
+import contextlib
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from typing import List, Optional
+import db
+from db import supabase
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process journal locking (run a single worker there)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# --- Activity Log Pipeline ---
+# Mutations enqueue their audit entry and return immediately. A background worker batches entries
+# into multi-row inserts (flushed by size or interval), retries with exponential backoff, and spills
+# anything it still cannot write to a local JSONL journal that is replayed in the background on the
+# next startup. Journal access is serialised across worker processes with flock: appends and claims take
+# a short lock on `<journal>.lock`, and a claimed `<journal>.replay.*` file stays locked while one
+# worker replays it. Lines that do not parse (a write torn by a crash) and rows the database rejects
+# on their own are moved to `<journal>.rejected` instead of blocking the rest. With sync=True (ACTIVITY_LOG_SYNC=1) each entry is instead inserted inline, as before
+# the pipeline existed, so the two can be benchmarked against each other.
+class ActivityLogger:
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0, max_retries: int = 5,
+                 retry_base_delay: float = 0.5, max_queue_size: int = 10000, drain_timeout: float = 10.0,
+                 journal_path: str = "activity_journal.jsonl", sync: bool = False):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.max_queue_size = max_queue_size
+        self.drain_timeout = drain_timeout
+        self.journal_path = journal_path
+        self.sync = sync
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._replay_task: Optional[asyncio.Task] = None
+        # Metrics
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_attempts = 0
+        self.spilled_rows = 0
+        self.replayed_rows = 0
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def log(self, entry: dict) -> None:
+        if self.queue is None:
+            # Not started (e.g. a script importing the app); keep the entry for the next replay
+            self._write_journal([entry])
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            logger.warning("Activity log queue is full; spilling entry to journal")
+            self._write_journal([entry])
+
+    async def write(self, entry: dict) -> None:
+        """Insert a single entry inline (sync mode), spilling it to the journal if the insert fails."""
+        try:
+            await db.execute(supabase.table("activity_log").insert(entry))
+        except Exception as e:
+            logger.error(f"Failed to log activity: {e}")
+            self._write_journal([entry])
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        # Replayed alongside live traffic: an unreachable database must not hold up startup
+        self._replay_task = asyncio.create_task(self._replay_journal())
+        self._worker_task = asyncio.create_task(self._worker())
+
+    async def stop(self) -> None:
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out draining activity log queue; spilling remaining entries to journal")
+        # Cancelled tasks journal whatever they hold (see _worker and _replay_journal)
+        tasks = [t for t in (self._worker_task, self._replay_task) if t]
+        for task in tasks:
+            task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"Activity log task failed: {result!r}")
+        remaining = []
+        while not self.queue.empty():
+            remaining.append(self.queue.get_nowait())
+        if remaining:
+            self._write_journal(remaining)
+        self.queue = None
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            try:
+                batch.append(await self.queue.get())
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                if not await self._flush(batch):
+                    self._write_journal(batch)
+            except asyncio.CancelledError:
+                # stop() gave up mid-batch; these entries are already off the queue, so journal them here
+                if batch:
+                    self._write_journal(batch)
+                raise
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _flush(self, rows: List[dict], attempts: Optional[int] = None) -> bool:
+        attempts = attempts or self.max_retries
+        delay = self.retry_base_delay
+        for attempt in range(1, attempts + 1):
+            start = time.perf_counter()
+            try:
+                await db.execute(supabase.table("activity_log").insert(rows))
+            except Exception as e:
+                self.failed_attempts += 1
+                logger.warning(f"Activity log flush of {len(rows)} rows failed (attempt {attempt}/{attempts}): {e}")
+                if attempt < attempts:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+                continue
+            self.last_flush_seconds = time.perf_counter() - start
+            self.total_flush_seconds += self.last_flush_seconds
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            return True
+        return False
+
+    @contextlib.contextmanager
+    def _journal_lock(self):
+        with open(f"{self.journal_path}.lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _write_journal(self, rows: List[dict]) -> None:
+        try:
+            with self._journal_lock(), open(self.journal_path, "a", encoding="utf-8") as journal:
+                journal.writelines(json.dumps(row, default=str) + "\n" for row in rows)
+            self.spilled_rows += len(rows)
+        except OSError as e:
+            logger.error(f"Failed to write {len(rows)} activity log entries to journal: {e}")
+
+    def _reject(self, lines: List[str], reason: str) -> None:
+        logger.error(f"Moving {len(lines)} activity log entries to {self.journal_path}.rejected: {reason}")
+        try:
+            with open(f"{self.journal_path}.rejected", "a", encoding="utf-8") as rejected:
+                rejected.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+        except OSError as e:
+            logger.error(f"Failed to write rejected activity log entries: {e}")
+
+    async def _replay_journal(self) -> None:
+        try:
+            # Claim the current journal so entries spilled from now on go to a fresh one
+            with self._journal_lock():
+                if os.path.exists(self.journal_path):
+                    os.replace(self.journal_path, f"{self.journal_path}.replay.{uuid.uuid4().hex}")
+            # Also picks up files left behind by workers that crashed mid-replay
+            for path in sorted(glob.glob(f"{glob.escape(self.journal_path)}.replay*")):
+                await self._replay_file(path)
+        except Exception as e:
+            logger.exception(f"Activity log journal replay failed: {e}")
+
+    async def _replay_file(self, path: str) -> None:
+        try:
+            replay = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            return  # Another worker finished it first
+        with replay:
+            if fcntl:
+                try:
+                    fcntl.flock(replay, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return  # Another worker is replaying it
+                if not os.path.exists(path):
+                    return  # Replayed and removed while we waited to open it
+            rows, torn = [], []
+            for line in replay:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    torn.append(line)
+            if torn:
+                self._reject(torn, "unparseable journal lines")
+            done = 0
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    batch = rows[start:start + self.batch_size]
+                    if await self._flush(batch):
+                        self.replayed_rows += len(batch)
+                    elif await self._database_reachable():
+                        rejected = await self._isolate(batch)
+                        if rejected:
+                            self._reject([json.dumps(row, default=str) for row in rejected], "rejected by the database")
+                    else:
+                        break  # Database still unreachable; the rest waits for the next startup
+                    done = start + len(batch)
+            finally:
+                # Also reached when stop() cancels the replay mid-flush
+                if done < len(rows):
+                    self._write_journal(rows[done:])
+                if not fcntl:
+                    replay.close()  # Windows cannot remove an open file
+                os.remove(path)
+        logger.info(f"Processed {done} of {len(rows)} activity log entries from {path}")
+
+    async def _database_reachable(self) -> bool:
+        try:
+            await db.execute(supabase.table("activity_log").select("id").limit(1))
+            return True
+        except Exception:
+            return False
+
+    async def _isolate(self, rows: List[dict]) -> List[dict]:
+        """Bisect a batch the database rejects, writing what it can; returns the rows that fail on their own."""
+        if await self._flush(rows, attempts=1):
+            self.replayed_rows += len(rows)
+            return []
+        if len(rows) == 1:
+            return rows
+        middle = len(rows) // 2
+        return await self._isolate(rows[:middle]) + await self._isolate(rows[middle:])
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_attempts": self.failed_attempts,
+            "spilled_rows": self.spilled_rows,
+            "replayed_rows": self.replayed_rows,
+            "last_flush_seconds": self.last_flush_seconds,
+            "avg_flush_seconds": self.total_flush_seconds / self.flushes if self.flushes else 0.0,
+        }
+
+activity_logger = ActivityLogger(
+    batch_size=int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "100")),
+    flush_interval=float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "1.0")),
+    max_retries=int(os.getenv("ACTIVITY_LOG_MAX_RETRIES", "5")),
+    journal_path=os.getenv("ACTIVITY_LOG_JOURNAL", "activity_journal.jsonl"),
+    sync=os.getenv("ACTIVITY_LOG_SYNC", "").lower() in ("1", "true", "yes"),
+)
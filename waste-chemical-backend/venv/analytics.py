@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import db
+from db import supabase
+
+logger = logging.getLogger(__name__)
+
+# --- Analytics Rollups ---
+# Per-month, per-status and per-category counters. They are built from grouped views
+# (migrations/002_analytics_rollups.sql), so the database does the counting, then kept current by the
+# create/update/delete handlers, so a read costs O(buckets) instead of O(rows). A stale read starts
+# a rebuild in the background and keeps serving the previous counters; only the first read waits.
+#
+# Writes recorded during a rebuild are replayed onto the new counters, except those recorded before
+# their table's query was issued: those rows are already in its result, and replaying them would
+# count a create twice or a delete twice. A write recorded while the query is in flight may or may not
+# be in the result, so such a build is replayed anyway and marked stale to be rebuilt on the next read.
+# Other workers' writes are reconciled by rebuilding every max_age seconds, and invalidate() bumps a
+# generation so an invalidation that lands mid-rebuild still forces another one.
+ROLLUP_DIMENSIONS = {"waste": ("status", "category"), "chemicals": ("category",)}
+ROLLUP_TABLES = {"waste": "waste", "chemicals": "chemical"}
+ROLLUP_VIEWS = {"waste": "waste_rollup", "chemicals": "chemical_rollup"}
+ROLLUP_PAGE_SIZE = 1000  # PostgREST's default max-rows on Supabase
+
+class RollupState:
+    def __init__(self):
+        self.monthly = defaultdict(Counter)
+        self.counters = {(kind, dim): Counter() for kind, dims in ROLLUP_DIMENSIONS.items() for dim in dims}
+        self.totals = Counter()
+
+    def apply(self, kind: str, row: dict, delta: int):
+        self.add(kind, (row.get("created_at") or "")[:7], row, delta)
+
+    def add(self, kind: str, month: Optional[str], row: dict, count: int):
+        if month:
+            self.monthly[month][kind] += count
+        for dim in ROLLUP_DIMENSIONS[kind]:
+            self.counters[(kind, dim)][row.get(dim) or "unknown"] += count
+        self.totals[kind] += count
+
+class AnalyticsRollup:
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        self.built_at: Optional[float] = None
+        self.build_id = ""
+        self.version = 0
+        self.generation = 0
+        self.built_generation = -1
+        self.state = RollupState()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Optional[List[tuple]] = None  # Deltas recorded while a rebuild runs
+
+    def record(self, kind: str, old: Optional[dict] = None, new: Optional[dict] = None):
+        if self._pending is not None:
+            self._pending.append((kind, old, new))
+        if self.built_at is None:
+            return  # Nothing built yet; the first read will build
+        self._apply_delta(self.state, kind, old, new)
+        self.version += 1
+
+    @staticmethod
+    def _apply_delta(state: RollupState, kind: str, old: Optional[dict], new: Optional[dict]):
+        if old:
+            state.apply(kind, old, -1)
+        if new:
+            state.apply(kind, new, 1)
+
+    def invalidate(self):
+        self.generation += 1
+
+    def is_fresh(self) -> bool:
+        return (self.built_at is not None and self.built_generation == self.generation
+                and time.time() - self.built_at <= self.max_age)
+
+    async def _fetch_groups(self, kind: str) -> List[dict]:
+        columns = ",".join(("month", *ROLLUP_DIMENSIONS[kind]))
+        groups, start = [], 0
+        while True:
+            query = supabase.table(ROLLUP_VIEWS[kind]).select(f"{columns},row_count").order(columns)
+            page = (await db.execute(query.range(start, start + ROLLUP_PAGE_SIZE))).data or []
+            groups.extend(page)
+            if len(page) < ROLLUP_PAGE_SIZE:
+                return groups
+            start += ROLLUP_PAGE_SIZE
+
+    async def rebuild(self):
+        async with self._lock:
+            generation = self.generation
+            self._pending = []
+            try:
+                state = RollupState()
+                issued: Dict[str, int] = {}
+                overlapped = False
+                for kind in ROLLUP_VIEWS:
+                    issued[kind] = len(self._pending)
+                    for group in await self._fetch_groups(kind):
+                        state.add(kind, group["month"], group, group["row_count"])
+                    overlapped |= any(k == kind for k, _, _ in self._pending[issued[kind]:])
+                # Readers kept the previous counters meanwhile; swap in the new ones with the deltas
+                # their queries cannot have seen
+                for index, (kind, old, new) in enumerate(self._pending):
+                    if index >= issued[kind]:
+                        self._apply_delta(state, kind, old, new)
+                self.state = state
+                self.built_at = time.time()
+                self.build_id = uuid.uuid4().hex[:12]
+                self.version = 0
+                self.built_generation = generation
+                if overlapped:
+                    self.invalidate()
+            finally:
+                self._pending = None
+
+    def _rebuild_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Analytics rebuild failed: {task.exception()}")
+
+    async def ensure_fresh(self):
+        if self.is_fresh():
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.rebuild())
+            self._task.add_done_callback(self._rebuild_done)
+        if self.built_at is None:
+            await asyncio.shield(self._task)  # Nothing to serve yet
+
+    def etag(self) -> str:
+        return f'W/"{self.build_id}-{self.version}"'
+
+    def snapshot(self) -> dict:
+        state = self.state
+
+        def buckets(counter: Counter) -> list:
+            return [{"name": name, "value": count} for name, count in sorted(counter.items()) if count > 0]
+        return {
+            "totals": {"waste": state.totals["waste"], "chemicals": state.totals["chemicals"]},
+            "monthly": [{"month": month, "waste": c["waste"], "chemicals": c["chemicals"]} for month, c in sorted(state.monthly.items()) if c["waste"] or c["chemicals"]],
+            "waste_by_status": buckets(state.counters[("waste", "status")]),
+            "waste_by_category": buckets(state.counters[("waste", "category")]),
+            "chemicals_by_category": buckets(state.counters[("chemicals", "category")]),
+        }
+
+analytics_rollup = AnalyticsRollup(max_age=float(os.getenv("ANALYTICS_MAX_AGE", "300")))
@@ -0,0 +1,214 @@
+"""Offline benchmark harness for the API.
+
+Runs the FastAPI app in-process against the in-memory Supabase stand-in (DB_BACKEND=memory), seeded
+with realistic table sizes, and reports throughput, latency percentiles, upstream calls per request
+and (optionally) memory allocations for each scenario.
+
+    cd waste-chemical-backend/venv
+    python benchmarks/run.py --rows 100000 --latency-ms 5 --concurrency 50,100,200
+    python benchmarks/run.py --scenarios auth,notifications --no-cache --remote-auth   # "before" numbers
+    python benchmarks/run.py --scenarios write --latency-ms 5 --sync-activity-log   # unbatched activity log
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCENARIOS = {
+    "auth": ("GET", "/api/user/profile", None),
+    "list": ("GET", "/api/waste?limit=100", None),
+    "search": ("GET", "/api/chemicals?search=7&limit=100", None),
+    "dashboard": ("GET", "/api/dashboard/stats", None),
+    "notifications": ("GET", "/api/notifications", None),
+    "analytics": ("GET", "/api/analytics", None),
+    "write": ("POST", "/api/waste", lambda i: {"name": f"Bench waste {i}", "category": "Plastic", "quantity": 1.5}),
+    "export": ("GET", "/api/exports/waste?format=ndjson", None),
+}
+DEFAULT_SCENARIOS = "auth,list,search,dashboard,notifications,analytics,write"
+PERMISSIONS = ["waste:read", "waste:create", "waste:update", "waste:delete",
+               "chemicals:read", "chemicals:create", "chemicals:update", "chemicals:delete", "admin:manage_users"]
+BENCH_SECRET = "benchmark-secret"
+
+def concurrency_levels(value: str) -> list:
+    try:
+        levels = [int(level) for level in value.split(",") if level.strip()]
+    except ValueError:
+        levels = []
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("expected positive integers, e.g. 50,100,200")
+    return levels
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="rows seeded into each of waste and chemical")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per upstream call")
+    parser.add_argument("--concurrency", type=concurrency_levels, default=[20], help="concurrent clients; a comma-separated list runs each level")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--remote-auth", action="store_true", help="validate tokens through (simulated) Supabase Auth instead of locally")
+    parser.add_argument("--no-cache", action="store_true", help="disable the token, permission, read and analytics caches")
+    parser.add_argument("--sync-activity-log", action="store_true", help="insert activity log entries inline instead of batching them")
+    parser.add_argument("--trace-allocations", action="store_true", help="record allocations with tracemalloc (slows requests down)")
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args()
+
+def configure_environment(args):
+    # Must happen before the app is imported: the backend and caches are configured at import time
+    workdir = tempfile.mkdtemp(prefix="waste-chemical-bench-")
+    os.environ.update({
+        "DB_BACKEND": "memory",
+        "DB_SIMULATED_LATENCY_MS": str(args.latency_ms),
+        "SUPABASE_JWT_SECRET": "" if args.remote_auth else BENCH_SECRET,
+        "SUPABASE_JWKS_URL": "",
+        "ACTIVITY_LOG_JOURNAL": os.path.join(workdir, "activity_journal.jsonl"),
+        "EXPORT_DIR": workdir,
+    })
+    if args.sync_activity_log:
+        os.environ["ACTIVITY_LOG_SYNC"] = "1"
+    if args.no_cache:
+        os.environ.update({"TOKEN_CACHE_TTL": "0", "PERMISSION_CACHE_TTL": "0", "READ_CACHE_TTL": "0", "ANALYTICS_MAX_AGE": "0"})
+
+def seed(client, rows: int) -> str:
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=730)
+    step = (now - start) / max(rows, 1)
+
+    client.seed("permissions", [{"id": f"perm-{i}", "name": name} for i, name in enumerate(PERMISSIONS)])
+    client.seed("roles", [{"id": "role-admin", "name": "admin"}])
+    client.seed("role_permissions", [{"id": f"rp-{i}", "role_id": "role-admin", "permission_id": f"perm-{i}"} for i in range(len(PERMISSIONS))])
+    user_id = "00000000-0000-0000-0000-000000000001"
+    client.seed("user_profiles", [{"id": user_id, "email": "bench@example.com", "role_id": "role-admin"}])
+
+    waste_categories = ["Plastic", "Metal", "Organic", "Chemical", "Electronic", "Glass"]
+    chemical_categories = ["Acid", "Base", "Solvent", "Oxidizer", "Salt", "Reagent", "Indicator", "Buffer"]
+    client.seed("waste", [{
+        "name": f"Waste {i}", "category": rng.choice(waste_categories), "quantity": round(rng.uniform(1, 500), 2),
+        "status": rng.choices(["pending", "collected", "disposed"], weights=[1, 3, 6])[0], "location": f"Bay {rng.randint(1, 40)}",
+        "collection_date": (start + step * i).date().isoformat(), "certificate_file_path": None,
+        "user_id": user_id, "created_at": (start + step * i).isoformat(),
+    } for i in range(rows)])
+    client.seed("chemical", [{
+        "name": f"Chemical {i}", "category": rng.choice(chemical_categories), "quantity": round(rng.uniform(0, 100), 2),
+        "expiration_date": (now + timedelta(days=rng.randint(-30, 1500))).date().isoformat(), "location": f"Cabinet {rng.randint(1, 60)}",
+        "sds_link": None, "reorder_level": rng.choice([None, None, 5.0, 10.0]), "sds_file_path": None,
+        "user_id": user_id, "created_at": (start + step * i).isoformat(),
+    } for i in range(rows)])
+    return user_id
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def upstream_totals(metrics) -> tuple:
+    series = metrics.upstream_calls_per_request.series.values()
+    return sum(s[-2] for s in series), sum(s[-1] for s in series)
+
+async def run_scenario(http, metrics, name: str, total: int, concurrency: int, trace: bool) -> dict:
+    method, path, body = SCENARIOS[name]
+    counter = iter(range(total))
+    latencies, errors = [], 0
+
+    async def request(i: int):
+        return await http.request(method, path, json=body(i) if body else None)
+
+    for i in range(min(20, total)):  # Warm caches, lazy indexes and rollups
+        await request(-i - 1)
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await request(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    calls_before, requests_before = upstream_totals(metrics)
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    allocated_peak = None
+    if trace:
+        _, allocated_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    calls_after, requests_after = upstream_totals(metrics)
+
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "upstream_calls_per_request": (calls_after - calls_before) / max(requests_after - requests_before, 1),
+        "alloc_peak_kib": allocated_peak / 1024 if allocated_peak is not None else None,
+    }
+
+def print_table(results, args):
+    print(f"rows={args.rows} latency={args.latency_ms}ms "
+          f"auth={'remote' if args.remote_auth else 'local'} caches={'off' if args.no_cache else 'on'} "
+          f"activity_log={'sync' if args.sync_activity_log else 'batched'}")
+    header = f"{'scenario':<14}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'upstream':>10}{'errors':>8}{'alloc KiB':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        alloc = f"{r['alloc_peak_kib']:.0f}" if r["alloc_peak_kib"] is not None else "-"
+        print(f"{r['scenario']:<14}{r['concurrency']:>8}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['max_ms']:>10.2f}{r['upstream_calls_per_request']:>10.2f}{r['errors']:>8}{alloc:>11}")
+
+async def main():
+    args = parse_args()
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)}")
+    configure_environment(args)
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # One INFO line per request otherwise
+
+    import httpx
+    from jose import jwt
+    import db
+    import main as api
+    import metrics
+
+    seed_started = time.perf_counter()
+    user_id = seed(db.supabase, args.rows)
+    print(f"Seeded {args.rows} waste and {args.rows} chemical rows in {time.perf_counter() - seed_started:.1f}s")
+    token = jwt.encode({"sub": user_id, "email": "bench@example.com", "aud": "authenticated",
+                        "exp": int(time.time()) + 3600}, BENCH_SECRET, algorithm="HS256")
+
+    await api.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers={"Authorization": f"Bearer {token}"}, timeout=None) as http:
+            results = []
+            for name in scenarios:
+                for concurrency in args.concurrency:
+                    results.append(await run_scenario(http, metrics, name, args.requests, concurrency, args.trace_allocations))
+    finally:
+        await api.app.router.shutdown()
+
+    print_table(results, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
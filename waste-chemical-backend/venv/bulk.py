@@ -0,0 +1,122 @@
+import codecs
+import csv
+import os
+from typing import AsyncIterator, Dict, List, Tuple, Type
+from fastapi import HTTPException, Request
+from postgrest.types import ReturnMethod
+from pydantic import BaseModel, ValidationError
+import db
+from db import supabase
+
+# --- Bulk Import ---
+# Rows are validated one at a time as they arrive (CSV is parsed straight off the request stream)
+# and written in chunked multi-row inserts/upserts, so a 10k-row import is ~20 upstream calls.
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+MAX_REPORTED_ERRORS = 1000
+
+async def iter_csv_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    header = None
+    buffer = ""
+    record = ""
+
+    def parse(text: str) -> List[str]:
+        return next(csv.reader([text]), [])
+
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            record += line + "\n"
+            if record.count('"') % 2:
+                continue  # Quoted field spans lines; keep accumulating
+            values, record = parse(record), ""
+            if not any(v.strip() for v in values):
+                continue
+            if header is None:
+                header = [h.strip() for h in values]
+            else:
+                yield dict(zip(header, values))
+    record += buffer + decoder.decode(b"", final=True)
+    if record.strip():
+        values = parse(record)
+        if header is not None and any(v.strip() for v in values):
+            yield dict(zip(header, values))
+
+async def iter_request_rows(request: Request) -> AsyncIterator[dict]:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        async for row in iter_csv_rows(request.stream()):
+            # Empty CSV cells mean "not provided"; dropping them lets fields fall back to their defaults
+            yield {k: v for k, v in row.items() if k and v.strip()}
+    elif content_type == "application/json":
+        try:
+            rows = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of rows")
+        for row in rows:
+            yield row if isinstance(row, dict) else {}
+    else:
+        raise HTTPException(status_code=415, detail="Send rows as a JSON array or a text/csv upload")
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+async def bulk_import(rows: AsyncIterator[dict], model: Type[BaseModel], table: str, user_id: str, allow_upsert: bool, update_permission: str) -> dict:
+    report = {"received": 0, "inserted": 0, "upserted": 0, "failed": 0, "errors": []}
+    inserts: List[Tuple[int, dict]] = []
+    # PostgREST takes a multi-row upsert's columns from its first row, so batches group rows by key set
+    upserts: Dict[frozenset, List[Tuple[int, dict]]] = {}
+
+    def add_error(row_number: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": message})
+
+    async def flush(batch: List[Tuple[int, dict]], upsert: bool):
+        if not batch:
+            return
+        payload = [data for _, data in batch]
+        try:
+            if upsert:
+                await db.execute(supabase.table(table).upsert(payload, returning=ReturnMethod.minimal))
+            else:
+                await db.execute(supabase.table(table).insert(payload, returning=ReturnMethod.minimal))
+        except Exception as e:
+            for row_number, _ in batch:
+                add_error(row_number, f"Database error: {e}")
+            return
+        report["upserted" if upsert else "inserted"] += len(batch)
+
+    async for row in rows:
+        report["received"] += 1
+        row_number = report["received"]
+        try:
+            parsed = model(**row)
+        except ValidationError as e:
+            add_error(row_number, format_validation_error(e))
+            continue
+        if parsed.id is None:
+            # New rows get the model defaults and belong to the importer
+            data = parsed.model_dump(exclude={"id"})
+            data["user_id"] = user_id
+            inserts.append((row_number, data))
+            if len(inserts) >= BULK_CHUNK_SIZE:
+                await flush(inserts, upsert=False)
+                inserts.clear()
+        elif not allow_upsert:
+            add_error(row_number, f"Missing required permission: {update_permission}")
+        else:
+            # Updates only send the columns present in the row, and keep the existing owner
+            data = parsed.model_dump(exclude_unset=True)
+            batch = upserts.setdefault(frozenset(data), [])
+            batch.append((row_number, data))
+            if len(batch) >= BULK_CHUNK_SIZE:
+                await flush(batch, upsert=True)
+                batch.clear()
+    await flush(inserts, upsert=False)
+    for batch in upserts.values():
+        await flush(batch, upsert=True)
+    return report
@@ -0,0 +1,76 @@
+import asyncio
+import functools
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from supabase import create_client
+from supabase.lib.client_options import ClientOptions
+import metrics
+
+# --- Data Access ---
+# supabase-py's query builders are synchronous. Every .execute() is pushed onto a bounded thread pool
+# so the event loop keeps serving other requests while PostgREST answers. Each client holds a single
+# httpx session, so connections are pooled and kept alive across requests and threads; the pool size
+# defaults to httpx's keep-alive limit (20) so workers never queue for a connection.
+load_dotenv()
+
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "20"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "30"))
+
+# DB_BACKEND=memory swaps in the in-process stand-in used by the benchmarks (see memory_backend.py);
+# DB_SIMULATED_LATENCY_MS adds a fixed delay to each of its calls.
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase")
+
+def _group_counts(rows, columns) -> list:
+    groups = Counter(((row.get("created_at") or "")[:7] or None, *(row.get(c) for c in columns)) for row in rows)
+    return [{"month": key[0], **dict(zip(columns, key[1:])), "row_count": count} for key, count in groups.items()]
+
+def create_clients():
+    if DB_BACKEND == "memory":
+        from memory_backend import MemoryClient
+        client = MemoryClient(latency=float(os.getenv("DB_SIMULATED_LATENCY_MS", "0")) / 1000)
+        # Mirrors migrations/001_read_path_aggregates.sql
+        client.register_view("chemical_low_stock", lambda c: [r for r in c.get_table("chemical").rows.values()
+                                                              if r.get("reorder_level") is not None and r["quantity"] <= r["reorder_level"]])
+        # Mirrors migrations/002_analytics_rollups.sql
+        client.register_view("waste_rollup", lambda c: _group_counts(c.get_table("waste").rows.values(), ("status", "category")))
+        client.register_view("chemical_rollup", lambda c: _group_counts(c.get_table("chemical").rows.values(), ("category",)))
+        return client, client
+    return (create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"), options=ClientOptions(postgrest_client_timeout=DB_TIMEOUT)),
+            create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY")))
+
+supabase, supabase_auth = create_clients()
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="supabase")
+
+async def run(fn, *args, **kwargs):
+    """Run a blocking call on the data-access thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+async def execute(query):
+    """Execute a PostgREST query builder without blocking the event loop."""
+    start = time.perf_counter()
+    try:
+        result = await run(query.execute)
+    except Exception:
+        metrics.observe_upstream(query, time.perf_counter() - start, failed=True)
+        raise
+    metrics.observe_upstream(query, time.perf_counter() - start)
+    return result
+
+async def call(table: str, operation: str, fn, *args, **kwargs):
+    """Run a blocking upstream call that is not a PostgREST query (Supabase Auth, JWKS), recorded like execute()."""
+    start = time.perf_counter()
+    try:
+        result = await run(fn, *args, **kwargs)
+    except Exception:
+        metrics.observe_upstream_call(table, operation, time.perf_counter() - start, failed=True)
+        raise
+    metrics.observe_upstream_call(table, operation, time.perf_counter() - start)
+    return result
+
+def shutdown():
+    _executor.shutdown(wait=True, cancel_futures=True)
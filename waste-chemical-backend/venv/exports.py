@@ -0,0 +1,167 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from fastapi.responses import StreamingResponse
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+import db
+from pagination import iter_pages
+
+logger = logging.getLogger(__name__)
+
+# --- Exports ---
+# CSV is streamed page by page straight from the keyset iterator, so memory stays constant.
+# PDFs are rendered by a background job into a temp file that the client polls for and downloads.
+# Each job's state is mirrored to a JSON file beside its PDF, so with several uvicorn workers a poll can
+# land on any of them. Workers must share EXPORT_DIR (same host, or shared storage across hosts).
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "waste-chemical-exports"))
+EXPORT_JOB_TTL = float(os.getenv("EXPORT_JOB_TTL", "3600"))
+
+def csv_response(build_query: Callable, columns: Sequence[str], filename: str) -> StreamingResponse:
+    async def body():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        async for rows in iter_pages(build_query, ",".join(columns)):
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    return StreamingResponse(body(), media_type="text/csv", headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+class PDFReport:
+    """Draws rows as a simple table, one page at a time, onto a reportlab canvas."""
+
+    def __init__(self, path: str, title: str, columns: Sequence[Tuple[str, str]]):
+        self.page_width, self.page_height = landscape(A4)
+        self.canvas = canvas.Canvas(path, pagesize=(self.page_width, self.page_height))
+        self.title = title
+        self.columns = columns
+        self.column_width = (self.page_width - 80) / len(columns)
+        self.y = 0.0
+        self._new_page(first=True)
+
+    def _new_page(self, first: bool = False):
+        if not first:
+            self.canvas.showPage()
+        self.y = self.page_height - 40
+        if first:
+            self.canvas.setFont("Helvetica-Bold", 14)
+            self.canvas.drawString(40, self.y, self.title)
+            self.y -= 28
+        self.canvas.setFont("Helvetica-Bold", 9)
+        for i, (_, label) in enumerate(self.columns):
+            self.canvas.drawString(40 + i * self.column_width, self.y, label)
+        self.y -= 16
+        self.canvas.setFont("Helvetica", 9)
+
+    def add_rows(self, rows: List[dict]):
+        for row in rows:
+            if self.y < 40:
+                self._new_page()
+            for i, (key, _) in enumerate(self.columns):
+                value = row.get(key)
+                text = "N/A" if value in (None, "") else str(value)
+                self.canvas.drawString(40 + i * self.column_width, self.y, text[:40])
+            self.y -= 14
+
+    def save(self):
+        self.canvas.save()
+
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+class ExportJobs:
+    def __init__(self):
+        self.jobs: Dict[str, dict] = {}  # Jobs started by this worker, holding their tasks
+
+    def start(self, user_id: str, build_query: Callable, title: str, columns: Sequence[Tuple[str, str]], filename: str) -> dict:
+        self._expire()
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "user_id": user_id, "status": "pending", "rows": 0, "filename": filename, "error": None,
+               "created_at": time.time(), "path": os.path.join(EXPORT_DIR, f"{job_id}.pdf")}
+        self.jobs[job_id] = job
+        self._save(job)
+        job["task"] = asyncio.create_task(self._run(job, build_query, title, columns))
+        return job
+
+    def get(self, job_id: str, user_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job is None and JOB_ID_PATTERN.fullmatch(job_id):
+            # Started by another worker; job_id is checked first because it becomes part of a path
+            try:
+                with open(self._state_path(job_id), encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return job if job and job["user_id"] == user_id else None
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(EXPORT_DIR, f"{job_id}.json")
+
+    def _save(self, job: dict):
+        path = self._state_path(job["id"])
+        try:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({k: v for k, v in job.items() if k != "task"}, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.error(f"Failed to save export job {job['id']} state: {e}")
+
+    async def _run(self, job: dict, build_query: Callable, title: str, columns: Sequence[Tuple[str, str]]):
+        job["status"] = "running"
+        self._save(job)
+        try:
+            report = await db.run(PDFReport, job["path"], title, columns)
+            async for rows in iter_pages(build_query, ",".join(dict.fromkeys(["id", "created_at", *(key for key, _ in columns)]))):
+                await db.run(report.add_rows, rows)
+                job["rows"] += len(rows)
+                self._save(job)
+            await db.run(report.save)
+            job["status"] = "done"
+        except asyncio.CancelledError:
+            # Shutdown or a cancelled request: record it so pollers don't wait on "running" forever
+            logger.warning(f"Export job {job['id']} was cancelled")
+            job["status"] = "failed"
+            job["error"] = "Export was cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Export job {job['id']} failed: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            self._save(job)
+
+    def _expire(self):
+        cutoff = time.time() - EXPORT_JOB_TTL
+        for job_id, job in list(self.jobs.items()):
+            if job["created_at"] < cutoff and job["status"] in ("done", "failed"):
+                del self.jobs[job_id]
+        if not os.path.isdir(EXPORT_DIR):
+            return
+        # Files are swept by age, which also cleans up after other (possibly exited) workers
+        for name in os.listdir(EXPORT_DIR):
+            job_id, ext = os.path.splitext(name)
+            if ext not in (".pdf", ".json") or not JOB_ID_PATTERN.fullmatch(job_id) or job_id in self.jobs:
+                continue
+            path = os.path.join(EXPORT_DIR, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+def public_job(job: dict) -> dict:
+    return {k: job[k] for k in ("id", "status", "rows", "filename", "error")}
+
+export_jobs = ExportJobs()
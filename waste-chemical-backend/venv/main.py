@@ -0,0 +1,540 @@
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import List, Literal, Optional
+import os
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from datetime import datetime, date, timedelta, timezone
+import asyncio
+import json
+from functools import partial
+import logging
+import time
+import httpx
+from jose import jwt, JOSEError, JWTError
+from cache import TTLCache
+import db
+from activity import activity_logger
+from bulk import bulk_import, iter_request_rows
+from exports import csv_response, export_jobs, public_job
+from analytics import ROLLUP_DIMENSIONS, ROLLUP_TABLES, analytics_rollup
+import metrics
+from metrics import MetricsMiddleware
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page, ndjson_response, order_keyset, select_columns
+from db import supabase, supabase_auth
+
+# --- Setup ---
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+load_dotenv()
+app = FastAPI(title="Waste & Chemical Management API", version="1.2.0")
+
+@app.on_event("startup")
+async def start_background_workers():
+    await activity_logger.start()
+
+@app.on_event("shutdown")
+async def shutdown_data_access():
+    await activity_logger.stop()
+    db.shutdown()
+
+# --- Metrics Middleware ---
+app.add_middleware(MetricsMiddleware)
+
+# --- CORS Middleware ---
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000", "http://localhost:5173"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+# --- Auth Configuration ---
+# Tokens are verified locally with the project's JWT secret (HS256) or its JWKS (asymmetric keys).
+# If neither is configured we fall back to asking Supabase Auth, caching the result briefly.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL")
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+PERMISSION_CACHE_TTL = float(os.getenv("PERMISSION_CACHE_TTL", "60"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "60"))
+# Tokens signed with an unknown kid trigger a JWKS refetch at most this often
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "60"))
+# Accepted algorithms per JWK key type; the token header never chooses the algorithm
+JWKS_ALGORITHMS = {"RSA": ["RS256"], "EC": ["ES256"]}
+
+jwks_cache = TTLCache(maxsize=1, ttl=3600)
+token_cache = TTLCache(maxsize=4096, ttl=TOKEN_CACHE_TTL)
+user_role_cache = TTLCache(maxsize=4096, ttl=PERMISSION_CACHE_TTL)
+role_permission_cache = TTLCache(maxsize=256, ttl=PERMISSION_CACHE_TTL)
+
+# Dashboard stats and notifications are polled constantly; serve them from a short-lived cache that
+# the waste/chemical write endpoints clear.
+read_cache = TTLCache(maxsize=16, ttl=float(os.getenv("READ_CACHE_TTL", "15")))
+
+CACHES = {"jwks": jwks_cache, "token": token_cache, "user_role": user_role_cache, "role_permission": role_permission_cache, "read": read_cache}
+metrics.registry.register(metrics.GaugeCallback("cache_stats", "In-process cache size, hits and misses", ("cache", "stat"),
+    lambda: {(name, stat): value for name, cache in CACHES.items() for stat, value in cache.stats().items()}))
+metrics.registry.register(metrics.GaugeCallback("activity_log_pipeline", "Activity log queue depth, flush counts and latency", ("stat",),
+    lambda: {(stat,): value for stat, value in activity_logger.stats().items()}))
+
+# --- Pydantic Models ---
+class WasteCreate(BaseModel):
+    name: str; category: str; quantity: float
+    collection_date: Optional[str] = None; status: str = "pending"; location: Optional[str] = None
+    certificate_file_path: Optional[str] = None
+
+class WasteUpdate(BaseModel):
+    name: Optional[str] = None; category: Optional[str] = None; quantity: Optional[float] = None
+    collection_date: Optional[str] = None; status: Optional[str] = None; location: Optional[str] = None
+    certificate_file_path: Optional[str] = None
+
+class ChemicalCreate(BaseModel):
+    name: str; category: str; quantity: float
+    expiration_date: Optional[str] = None; location: Optional[str] = None
+    sds_link: Optional[str] = None; reorder_level: Optional[float] = None
+    sds_file_path: Optional[str] = None
+
+class ChemicalUpdate(BaseModel):
+    name: Optional[str] = None; category: Optional[str] = None; quantity: Optional[float] = None
+    expiration_date: Optional[str] = None; location: Optional[str] = None
+    sds_link: Optional[str] = None; reorder_level: Optional[float] = None
+    sds_file_path: Optional[str] = None
+
+class AuthUser(BaseModel):
+    id: str
+    email: Optional[str] = None
+
+# Bulk rows may carry an existing id, in which case they are upserted
+class WasteBulkRow(WasteCreate):
+    id: Optional[str] = None
+
+class ChemicalBulkRow(ChemicalCreate):
+    id: Optional[str] = None
+
+WASTE_COLUMNS = {"id", "created_at", "user_id", *WasteCreate.model_fields}
+CHEMICAL_COLUMNS = {"id", "created_at", "user_id", *ChemicalCreate.model_fields}
+
+class UserUpdate(BaseModel):
+    role_id: str
+
+class SignedURLRequest(BaseModel):
+    file_name: str
+    bucket: str
+
+# --- Helper Functions ---
+async def log_activity(user, action: str, details: dict):
+    # Queued for the batched background writer; created_at is stamped now so delayed flushes keep the real time
+    entry = {"user_id": user.id, "user_email": user.email, "action": action, "details": details, "created_at": datetime.now(timezone.utc).isoformat()}
+    if activity_logger.sync:
+        await activity_logger.write(entry)
+    else:
+        activity_logger.log(entry)
+
+async def list_rows(response: Response, build_query, columns: str, limit: Optional[int], cursor: Optional[str], output: str):
+    # ndjson streams the whole result set in keyset-paged chunks; limit/cursor return a single page
+    # with the next cursor in X-Next-Cursor; neither returns the full list as before.
+    if output == "ndjson":
+        return ndjson_response(build_query, columns)
+    if limit or cursor:
+        rows, next_cursor = await fetch_page(build_query, columns, limit or DEFAULT_PAGE_SIZE, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return rows
+    result = await db.execute(order_keyset(build_query(columns)))
+    return result.data or []
+
+def invalidate_read_caches():
+    read_cache.clear()
+
+async def fetch_rollup_row(kind: str, row_id: str, changes: dict) -> Optional[dict]:
+    # Only updates that move a row between analytics buckets need its previous values
+    dimensions = ROLLUP_DIMENSIONS[kind]
+    if analytics_rollup.built_at is None or not set(changes) & set(dimensions):
+        return None
+    response = await db.execute(supabase.table(ROLLUP_TABLES[kind]).select(", ".join(("created_at", *dimensions))).eq("id", row_id).single())
+    return response.data
+
+# --- Authentication & Authorization ---
+jwks_fetched_at = 0.0
+jwks_lock = asyncio.Lock()
+
+async def get_jwks(refresh: bool = False) -> dict:
+    global jwks_fetched_at
+    jwks = jwks_cache.get("jwks")
+    if jwks is not None and not refresh:
+        return jwks
+    requested_at = time.monotonic()
+    async with jwks_lock:  # Single flight: concurrent requests on a cold worker share one fetch
+        jwks = jwks_cache.get("jwks")
+        if jwks is not None and (not refresh or jwks_fetched_at >= requested_at):
+            return jwks
+        response = await db.call("auth", "jwks", httpx.get, SUPABASE_JWKS_URL, timeout=10)
+        response.raise_for_status()
+        jwks = response.json()
+        jwks_cache.set("jwks", jwks)
+        jwks_fetched_at = time.monotonic()
+    return jwks
+
+def find_jwk(jwks: dict, kid: Optional[str]) -> Optional[dict]:
+    return next((k for k in jwks.get("keys", []) if k.get("kid") == kid), None)
+
+async def verify_token(token: str) -> AuthUser:
+    if SUPABASE_JWKS_URL:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = find_jwk(await get_jwks(), kid)
+        if key is None and time.monotonic() - jwks_fetched_at >= JWKS_MIN_REFRESH_INTERVAL:
+            key = find_jwk(await get_jwks(refresh=True), kid)  # Keys may have been rotated
+        if key is None:
+            raise JWTError("Unknown signing key")
+        algorithms = JWKS_ALGORITHMS.get(key.get("kty"))
+        if not algorithms:
+            raise JWTError(f"Unsupported key type: {key.get('kty')}")
+        claims = jwt.decode(token, key, algorithms=algorithms, audience=JWT_AUDIENCE)
+    else:
+        claims = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], audience=JWT_AUDIENCE)
+    return AuthUser(id=claims["sub"], email=claims.get("email"))
+
+async def get_current_user(authorization: Optional[str] = Header(None)) -> AuthUser:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authorization header required")
+    token = authorization.replace("Bearer ", "")
+    if SUPABASE_JWT_SECRET or SUPABASE_JWKS_URL:
+        try:
+            return await verify_token(token)
+        except (JOSEError, KeyError):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"JWKS fetch failed: {e}")
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Unable to verify token")
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    try:
+        user_response = await db.call("auth", "get_user", supabase_auth.auth.get_user, token)
+        if not user_response.user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        user = AuthUser(id=user_response.user.id, email=user_response.user.email)
+        # Supabase has validated the token, so its exp claim can bound how long we trust it
+        ttl = min(token_cache.ttl, jwt.get_unverified_claims(token).get("exp", 0) - time.time())
+        if ttl > 0:
+            token_cache.set(token, user, ttl=ttl)
+        return user
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+# Resolved once per request (FastAPI caches dependencies), so stacked require_permission checks share it.
+async def get_user_permissions(user: AuthUser = Depends(get_current_user)) -> frozenset:
+    try:
+        role_id = user_role_cache.get(user.id)
+        if role_id is None:
+            profile_res = await db.execute(supabase.table("user_profiles").select("role_id").eq("id", user.id).single())
+            role_id = profile_res.data.get("role_id") if profile_res.data else None
+            if not role_id:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User has no assigned role.")
+            user_role_cache.set(user.id, role_id)
+
+        permissions = role_permission_cache.get(role_id)
+        if permissions is None:
+            permission_res = await db.execute(supabase.table("role_permissions").select("permissions(name)").eq("role_id", role_id))
+            permissions = frozenset(p["permissions"]["name"] for p in permission_res.data or [] if p.get("permissions"))
+            role_permission_cache.set(role_id, permissions)
+        return permissions
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Permission lookup failed for user {user.id}: {e}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied.")
+
+def require_permission(permission: str):
+    async def permission_checker(permissions: frozenset = Depends(get_user_permissions)):
+        if permission not in permissions:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Missing required permission: {permission}")
+        return True # Permission granted
+    return permission_checker
+
+# --- API Endpoints ---
+
+@app.get("/api/user/profile")
+async def get_user_profile(user=Depends(get_current_user)):
+    # Fetches user profile, role, and all their permissions
+    profile_res = await db.execute(supabase.table("user_profiles").select("*, roles(name)").eq("id", user.id).single())
+    if not profile_res.data:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    try:
+        permissions = await get_user_permissions(user)
+    except HTTPException:
+        permissions = frozenset()
+    profile_res.data["permissions"] = sorted(permissions)
+    return profile_res.data
+
+@app.get("/api/admin/users", dependencies=[Depends(require_permission("admin:manage_users"))])
+async def get_all_users():
+    response = await db.execute(supabase.table("user_profiles").select("id, email, roles(id, name)"))
+    return response.data
+
+@app.put("/api/admin/users/{user_id}", dependencies=[Depends(require_permission("admin:manage_users"))])
+async def update_user_role(user_id: str, user_update: UserUpdate, user=Depends(get_current_user)):
+    response = await db.execute(supabase.table("user_profiles").update({"role_id": user_update.role_id}).eq("id", user_id))
+    user_role_cache.pop(user_id)
+    await log_activity(user, "Updated User Role", {"target_user_id": user_id, "new_role_id": user_update.role_id})
+    return response.data[0]
+
+@app.get("/api/admin/activity-log/stats", dependencies=[Depends(require_permission("admin:manage_users"))])
+async def get_activity_log_stats():
+    return activity_logger.stats()
+
+@app.get("/api/admin/roles", dependencies=[Depends(require_permission("admin:manage_users"))])
+async def get_all_roles():
+    response = await db.execute(supabase.table("roles").select("*"))
+    return response.data
+
+@app.post("/api/storage/upload-url")
+async def create_upload_url(request: SignedURLRequest, user=Depends(get_current_user)):
+    try:
+        # Supabase Python library currently doesn't support creating signed upload URLs directly.
+        # We will construct the path and let the frontend upload with its anon key, relying on RLS policies.
+        # For production, a more secure method would be a Supabase Edge Function.
+        file_path = f"{user.id}/{datetime.now().timestamp()}-{request.file_name}"
+        return {"path": file_path}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/notifications", dependencies=[Depends(require_permission("waste:read")), Depends(require_permission("chemicals:read"))])
+async def get_notifications(user=Depends(get_current_user)):
+    cached = read_cache.get("notifications")
+    if cached is not None:
+        return cached
+    thirty_days_from_now = (datetime.now() + timedelta(days=30)).date()
+    # Low stock is filtered by the chemical_low_stock view (migrations/001_read_path_aggregates.sql)
+    expiring_res, low_stock_res, pending_res = await asyncio.gather(
+        db.execute(supabase.table("chemical").select("id, name").lte("expiration_date", str(thirty_days_from_now))),
+        db.execute(supabase.table("chemical_low_stock").select("id, name")),
+        db.execute(supabase.table("waste").select("id, name").eq("status", "pending")),
+    )
+    notifications = []
+    for item in expiring_res.data or []:
+        notifications.append({"id": f"exp-{item['id']}", "type": "expiring", "message": f"'{item['name']}' is expiring soon.", "link": f"/chemicals?search={item['name']}"})
+    for item in low_stock_res.data or []:
+        notifications.append({"id": f"low-{item['id']}", "type": "low_stock", "message": f"'{item['name']}' is low on stock.", "link": f"/chemicals?search={item['name']}"})
+    for item in pending_res.data or []:
+        notifications.append({"id": f"pending-{item['id']}", "type": "pending_waste", "message": f"'{item['name']}' is pending collection.", "link": f"/waste?search={item['name']}"})
+    read_cache.set("notifications", notifications)
+    return notifications
+
+@app.get("/api/activity-log", dependencies=[Depends(require_permission("admin:manage_users"))])
+async def get_activity_log(limit: int = 50):
+    response = await db.execute(supabase.table("activity_log").select("*").order("created_at", desc=True).limit(limit))
+    return response.data
+
+def apply_created_range(query, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    if date_from: query = query.gte("created_at", date_from.isoformat())
+    if date_to: query = query.lt("created_at", (date_to + timedelta(days=1)).isoformat())  # date_to is inclusive
+    return query
+
+def waste_query(columns: str = "*", category: Optional[str] = None, status: Optional[str] = None, search: Optional[str] = None,
+                date_from: Optional[date] = None, date_to: Optional[date] = None):
+    query = supabase.table("waste").select(columns)
+    if category: query = query.eq("category", category)
+    if status: query = query.eq("status", status)
+    if search: query = query.ilike("name", f"%{search}%")
+    return apply_created_range(query, date_from, date_to)
+
+@app.get("/api/waste", dependencies=[Depends(require_permission("waste:read"))])
+async def get_waste(response: Response, category: Optional[str] = None, status: Optional[str] = None, search: Optional[str] = None,
+                    fields: Optional[str] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                    output: str = Query("json", alias="format", pattern="^(json|ndjson)$")):
+    columns = select_columns(fields, WASTE_COLUMNS)
+    build_query = partial(waste_query, category=category, status=status, search=search)
+    return await list_rows(response, build_query, columns, limit, cursor, output)
+
+@app.post("/api/waste", dependencies=[Depends(require_permission("waste:create"))])
+async def create_waste(waste: WasteCreate, user=Depends(get_current_user)):
+    waste_data = waste.dict()
+    waste_data["user_id"] = user.id
+    response = await db.execute(supabase.table("waste").insert(waste_data))
+    invalidate_read_caches()
+    analytics_rollup.record("waste", new=response.data[0])
+    await log_activity(user, "Created Waste", {"name": waste.name, "id": response.data[0]['id']})
+    return response.data[0]
+
+@app.post("/api/waste/bulk", dependencies=[Depends(require_permission("waste:create"))])
+async def bulk_import_waste(request: Request, user=Depends(get_current_user), permissions: frozenset = Depends(get_user_permissions)):
+    report = await bulk_import(iter_request_rows(request), WasteBulkRow, "waste", user.id, "waste:update" in permissions, "waste:update")
+    invalidate_read_caches()
+    analytics_rollup.invalidate()
+    await log_activity(user, "Imported Waste", {k: report[k] for k in ("received", "inserted", "upserted", "failed")})
+    return report
+
+@app.put("/api/waste/{waste_id}", dependencies=[Depends(require_permission("waste:update"))])
+async def update_waste(waste_id: str, waste: WasteUpdate, user=Depends(get_current_user)):
+    waste_data = {k: v for k, v in waste.dict().items() if v is not None}
+    if waste_data.get("collection_date") == "": waste_data["collection_date"] = None
+    previous = await fetch_rollup_row("waste", waste_id, waste_data)
+    response = await db.execute(supabase.table("waste").update(waste_data).eq("id", waste_id))
+    invalidate_read_caches()
+    if previous: analytics_rollup.record("waste", old=previous, new=response.data[0])
+    await log_activity(user, "Updated Waste", {"name": waste.name or response.data[0]['name'], "id": waste_id})
+    return response.data[0]
+
+@app.delete("/api/waste/{waste_id}", dependencies=[Depends(require_permission("waste:delete"))])
+async def delete_waste(waste_id: str, user=Depends(get_current_user)):
+    item_to_delete = await db.execute(supabase.table("waste").select("name, created_at, status, category").eq("id", waste_id).single())
+    await db.execute(supabase.table("waste").delete().eq("id", waste_id))
+    invalidate_read_caches()
+    analytics_rollup.record("waste", old=item_to_delete.data)
+    await log_activity(user, "Deleted Waste", {"name": item_to_delete.data['name'], "id": waste_id})
+    return {"message": "Waste deleted successfully"}
+
+def chemical_query(columns: str = "*", category: Optional[str] = None, search: Optional[str] = None, expiring_soon: Optional[bool] = None,
+                   date_from: Optional[date] = None, date_to: Optional[date] = None):
+    query = supabase.table("chemical").select(columns)
+    if category: query = query.eq("category", category)
+    if search: query = query.ilike("name", f"%{search}%")
+    if expiring_soon:
+        thirty_days_from_now = (datetime.now() + timedelta(days=30)).date()
+        query = query.lte("expiration_date", str(thirty_days_from_now))
+    return apply_created_range(query, date_from, date_to)
+
+@app.get("/api/chemicals", dependencies=[Depends(require_permission("chemicals:read"))])
+async def get_chemicals(response: Response, category: Optional[str] = None, search: Optional[str] = None, expiring_soon: Optional[bool] = None,
+                        fields: Optional[str] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                        output: str = Query("json", alias="format", pattern="^(json|ndjson)$")):
+    columns = select_columns(fields, CHEMICAL_COLUMNS)
+    build_query = partial(chemical_query, category=category, search=search, expiring_soon=expiring_soon)
+    return await list_rows(response, build_query, columns, limit, cursor, output)
+
+@app.post("/api/chemicals", dependencies=[Depends(require_permission("chemicals:create"))])
+async def create_chemical(chemical: ChemicalCreate, user=Depends(get_current_user)):
+    chemical_data = chemical.dict()
+    chemical_data["user_id"] = user.id
+    response = await db.execute(supabase.table("chemical").insert(chemical_data))
+    invalidate_read_caches()
+    analytics_rollup.record("chemicals", new=response.data[0])
+    await log_activity(user, "Created Chemical", {"name": chemical.name, "id": response.data[0]['id']})
+    return response.data[0]
+
+@app.post("/api/chemicals/bulk", dependencies=[Depends(require_permission("chemicals:create"))])
+async def bulk_import_chemicals(request: Request, user=Depends(get_current_user), permissions: frozenset = Depends(get_user_permissions)):
+    report = await bulk_import(iter_request_rows(request), ChemicalBulkRow, "chemical", user.id, "chemicals:update" in permissions, "chemicals:update")
+    invalidate_read_caches()
+    analytics_rollup.invalidate()
+    await log_activity(user, "Imported Chemicals", {k: report[k] for k in ("received", "inserted", "upserted", "failed")})
+    return report
+
+@app.put("/api/chemicals/{chemical_id}", dependencies=[Depends(require_permission("chemicals:update"))])
+async def update_chemical(chemical_id: str, chemical: ChemicalUpdate, user=Depends(get_current_user)):
+    chemical_data = {k: v for k, v in chemical.dict().items() if v is not None}
+    if chemical_data.get("expiration_date") == "": chemical_data["expiration_date"] = None
+    previous = await fetch_rollup_row("chemicals", chemical_id, chemical_data)
+    response = await db.execute(supabase.table("chemical").update(chemical_data).eq("id", chemical_id))
+    invalidate_read_caches()
+    if previous: analytics_rollup.record("chemicals", old=previous, new=response.data[0])
+    await log_activity(user, "Updated Chemical", {"name": chemical.name or response.data[0]['name'], "id": chemical_id})
+    return response.data[0]
+
+@app.delete("/api/chemicals/{chemical_id}", dependencies=[Depends(require_permission("chemicals:delete"))])
+async def delete_chemical(chemical_id: str, user=Depends(get_current_user)):
+    item_to_delete = await db.execute(supabase.table("chemical").select("name, created_at, category").eq("id", chemical_id).single())
+    await db.execute(supabase.table("chemical").delete().eq("id", chemical_id))
+    invalidate_read_caches()
+    analytics_rollup.record("chemicals", old=item_to_delete.data)
+    await log_activity(user, "Deleted Chemical", {"name": item_to_delete.data['name'], "id": chemical_id})
+    return {"message": "Chemical deleted successfully"}
+
+# --- Analytics ---
+@app.get("/api/analytics", dependencies=[Depends(require_permission("waste:read")), Depends(require_permission("chemicals:read"))])
+async def get_analytics(response: Response, if_none_match: Optional[str] = Header(None)):
+    await analytics_rollup.ensure_fresh()
+    etag = analytics_rollup.etag()
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return analytics_rollup.snapshot()
+
+@app.post("/api/analytics/rebuild", dependencies=[Depends(require_permission("admin:manage_users"))])
+async def rebuild_analytics():
+    await analytics_rollup.rebuild()
+    return {"message": "Analytics rebuilt", "etag": analytics_rollup.etag()}
+
+# --- Exports ---
+EXPORT_CSV_COLUMNS = {
+    "waste": ["id", "created_at", *WasteCreate.model_fields],
+    "chemicals": ["id", "created_at", *ChemicalCreate.model_fields],
+}
+EXPORT_PDF_COLUMNS = {
+    "waste": [("name", "Name"), ("category", "Category"), ("quantity", "Quantity"), ("status", "Status"), ("collection_date", "Collection Date")],
+    "chemicals": [("name", "Name"), ("category", "Category"), ("quantity", "Quantity"), ("expiration_date", "Expiration Date"), ("location", "Location")],
+}
+
+def export_query(kind: str, permissions: frozenset, category: Optional[str], status: Optional[str], date_from: Optional[date], date_to: Optional[date]):
+    if f"{kind}:read" not in permissions:
+        raise HTTPException(status_code=403, detail=f"Missing required permission: {kind}:read")
+    if kind == "waste":
+        return partial(waste_query, category=category, status=status, date_from=date_from, date_to=date_to)
+    if status:
+        raise HTTPException(status_code=400, detail="status filter is only supported for waste exports")
+    return partial(chemical_query, category=category, date_from=date_from, date_to=date_to)
+
+@app.get("/api/exports/jobs/{job_id}")
+async def get_export_job(job_id: str, user=Depends(get_current_user)):
+    job = export_jobs.get(job_id, user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return public_job(job)
+
+@app.get("/api/exports/jobs/{job_id}/download")
+async def download_export_job(job_id: str, user=Depends(get_current_user)):
+    job = export_jobs.get(job_id, user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+    return FileResponse(job["path"], media_type="application/pdf", filename=job["filename"])
+
+@app.get("/api/exports/{kind}")
+async def export_rows(kind: Literal["waste", "chemicals"], output: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+                      category: Optional[str] = None, status: Optional[str] = None, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                      permissions: frozenset = Depends(get_user_permissions)):
+    build_query = export_query(kind, permissions, category, status, date_from, date_to)
+    if output == "ndjson":
+        return ndjson_response(build_query, ",".join(EXPORT_CSV_COLUMNS[kind]), filename=f"{kind}_report.ndjson")
+    return csv_response(build_query, EXPORT_CSV_COLUMNS[kind], filename=f"{kind}_report.csv")
+
+@app.post("/api/exports/{kind}/pdf", status_code=202)
+async def start_pdf_export(kind: Literal["waste", "chemicals"], category: Optional[str] = None, status: Optional[str] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None,
+                           user=Depends(get_current_user), permissions: frozenset = Depends(get_user_permissions)):
+    build_query = export_query(kind, permissions, category, status, date_from, date_to)
+    job = export_jobs.start(user.id, build_query, f"{kind.capitalize()} Report", EXPORT_PDF_COLUMNS[kind], f"{kind}_report.pdf")
+    return public_job(job)
+
+# --- Metrics ---
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# Dashboard endpoint does not need specific permissions beyond being logged in
+@app.get("/api/dashboard/stats")
+async def get_dashboard_stats(user=Depends(get_current_user)):
+    cached = read_cache.get("dashboard_stats")
+    if cached is not None:
+        return cached
+    thirty_days_from_now = (datetime.now() + timedelta(days=30)).date()
+    # count="exact" with limit(1) returns just the count header value instead of the matching rows
+    waste_response, chemical_response, expiring_chemicals, pending_waste = await asyncio.gather(
+        db.execute(supabase.table("waste").select("id", count="exact").limit(1)),
+        db.execute(supabase.table("chemical").select("id", count="exact").limit(1)),
+        db.execute(supabase.table("chemical").select("id", count="exact").lte("expiration_date", str(thirty_days_from_now)).limit(1)),
+        db.execute(supabase.table("waste").select("id", count="exact").eq("status", "pending").limit(1)),
+    )
+    stats = {"total_waste": waste_response.count or 0, "total_chemicals": chemical_response.count or 0, "expiring_chemicals": expiring_chemicals.count or 0, "pending_waste": pending_waste.count or 0}
+    read_cache.set("dashboard_stats", stats)
+    return stats
@@ -0,0 +1,390 @@
+import bisect
+import functools
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+from jose import jwt
+
+# --- In-Memory Backend ---
+# A stand-in for the Supabase client, selected with DB_BACKEND=memory. It implements the subset of
+# the supabase-py / postgrest-py builder API the app uses: table().select/insert/upsert/update/delete,
+# eq/neq/lt/lte/gt/gte/like/ilike/is_/not_/or_, order, limit, range, single, count="exact", many-to-one
+# embeds such as "roles(name)", and auth.get_user. Rows live in dicts keyed by id, with hash indexes
+# built on demand for eq filters and a sorted (created_at, id) index so keyset pages are range scans,
+# which keeps the stand-in's own cost small next to the app's at 1M rows. `latency` (seconds) is slept
+# per call outside the lock to simulate the PostgREST round trip.
+class MemoryAPIError(Exception):
+    pass
+
+class MemoryResponse:
+    def __init__(self, data, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+def _split_top_level(text: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current.strip())
+            current = ""
+            continue
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+def _parse_logic(text: str) -> tuple:
+    # PostgREST logic tree: "a.lt.1,and(b.eq.2,c.lt.3)" -> ("or", [...])
+    terms = []
+    for part in _split_top_level(text):
+        match = re.match(r"^(and|or)\((.*)\)$", part, re.S)
+        if match:
+            terms.append((match.group(1), _parse_logic(match.group(2))[1]))
+        else:
+            column, op, value = part.split(".", 2)
+            terms.append((column, op, value.strip('"'), False))
+    return ("or", terms)
+
+def _coerce(row_value, value):
+    if isinstance(row_value, bool) and isinstance(value, str):
+        return value.lower() == "true"
+    if isinstance(row_value, (int, float)) and isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    if isinstance(row_value, str) and not isinstance(value, str):
+        return str(value)
+    return value
+
+@functools.lru_cache(maxsize=256)
+def _like(pattern: str, flags=0):
+    return re.compile("^" + ".*".join(re.escape(p) for p in pattern.replace("*", "%").split("%")) + "$", flags | re.S)
+
+def _matches(row: dict, condition: tuple) -> bool:
+    if condition[0] in ("and", "or"):
+        results = (_matches(row, term) for term in condition[1])
+        return all(results) if condition[0] == "and" else any(results)
+    column, op, value, negate = condition
+    row_value = row.get(column)
+    if op == "is":
+        result = row_value is (None if value in (None, "null") else value in (True, "true"))
+    elif row_value is None:
+        result = False
+    else:
+        value = _coerce(row_value, value)
+        if op == "eq": result = row_value == value
+        elif op == "neq": result = row_value != value
+        elif op == "lt": result = row_value < value
+        elif op == "lte": result = row_value <= value
+        elif op == "gt": result = row_value > value
+        elif op == "gte": result = row_value >= value
+        elif op == "like": result = bool(_like(str(value)).match(str(row_value)))
+        elif op == "ilike": result = bool(_like(str(value), re.I).match(str(row_value)))
+        else: raise MemoryAPIError(f"Unsupported filter operator: {op}")
+    return result != negate
+
+def _upper_bound(condition: tuple, column: str):
+    """Largest value of `column` a row can have and still match, if the condition implies one."""
+    if condition[0] == "and":
+        bounds = [b for b in (_upper_bound(t, column) for t in condition[1]) if b is not None]
+        return min(bounds) if bounds else None
+    if condition[0] == "or":
+        bounds = [_upper_bound(t, column) for t in condition[1]]
+        return None if not bounds or None in bounds else max(bounds)
+    name, op, value, negate = condition
+    return value if name == column and op in ("lt", "lte", "eq") and not negate else None
+
+class MemoryTable:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Dict[str, dict] = {}
+        self.indexes: Dict[str, Dict[object, set]] = {}
+        self.created_index: List[tuple] = []  # sorted (created_at, id)
+
+    def index(self, column: str) -> Dict[object, set]:
+        if column not in self.indexes:
+            index: Dict[object, set] = {}
+            for row_id, row in self.rows.items():
+                index.setdefault(row.get(column), set()).add(row_id)
+            self.indexes[column] = index
+        return self.indexes[column]
+
+    def add(self, row: dict):
+        self.rows[row["id"]] = row
+        for column, index in self.indexes.items():
+            index.setdefault(row.get(column), set()).add(row["id"])
+        bisect.insort(self.created_index, (row.get("created_at") or "", row["id"]))
+
+    def remove(self, row: dict):
+        del self.rows[row["id"]]
+        for column, index in self.indexes.items():
+            index.get(row.get(column), set()).discard(row["id"])
+        position = bisect.bisect_left(self.created_index, (row.get("created_at") or "", row["id"]))
+        del self.created_index[position]
+
+class MemoryQuery:
+    def __init__(self, client: "MemoryClient", table: str):
+        self.client = client
+        self.table = table
+        self.path = f"/{table}"
+        self.http_method = "GET"
+        self.headers: Dict[str, str] = {}
+        self.columns = "*"
+        self.count_method = None
+        self.payload = None
+        self.returning_minimal = False
+        self.conditions: List[tuple] = []
+        self.embed_conditions: List[tuple] = []
+        self.orders: List[tuple] = []
+        self.limit_count: Optional[int] = None
+        self.offset = 0
+        self.is_single = False
+        self.negate_next = False
+
+    # Operations
+    def select(self, *columns: str, count: Optional[str] = None):
+        self.columns = ",".join(columns) or "*"
+        self.count_method = count
+        return self
+
+    def insert(self, json, *, count=None, returning=None, upsert: bool = False):
+        self.http_method = "POST"
+        self.payload = json if isinstance(json, list) else [json]
+        self.returning_minimal = getattr(returning, "value", returning) == "minimal"
+        if upsert:
+            self.headers["Prefer"] = "resolution=merge-duplicates"
+        return self
+
+    def upsert(self, json, *, count=None, returning=None, ignore_duplicates: bool = False, on_conflict: str = ""):
+        return self.insert(json, count=count, returning=returning, upsert=True)
+
+    def update(self, json, *, count=None, returning=None):
+        self.http_method = "PATCH"
+        self.payload = json
+        self.returning_minimal = getattr(returning, "value", returning) == "minimal"
+        return self
+
+    def delete(self, *, count=None, returning=None):
+        self.http_method = "DELETE"
+        self.returning_minimal = getattr(returning, "value", returning) == "minimal"
+        return self
+
+    # Filters
+    @property
+    def not_(self):
+        self.negate_next = True
+        return self
+
+    def filter(self, column: str, operator: str, criteria):
+        condition = (column, operator, criteria, self.negate_next)
+        self.negate_next = False
+        (self.embed_conditions if "." in column else self.conditions).append(condition)
+        return self
+
+    def eq(self, column, value): return self.filter(column, "eq", value)
+    def neq(self, column, value): return self.filter(column, "neq", value)
+    def lt(self, column, value): return self.filter(column, "lt", value)
+    def lte(self, column, value): return self.filter(column, "lte", value)
+    def gt(self, column, value): return self.filter(column, "gt", value)
+    def gte(self, column, value): return self.filter(column, "gte", value)
+    def like(self, column, pattern): return self.filter(column, "like", pattern)
+    def ilike(self, column, pattern): return self.filter(column, "ilike", pattern)
+    def is_(self, column, value): return self.filter(column, "is", value)
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        self.conditions.append(_parse_logic(filters))
+        return self
+
+    # Modifiers
+    def order(self, column: str, *, desc: bool = False, nullsfirst: bool = False, foreign_table: Optional[str] = None):
+        # Same spec PostgREST receives, so combined specs like "created_at.desc,id" work too
+        spec = f"{column}{'.desc' if desc else ''}"
+        for part in spec.split(","):
+            name, *flags = part.strip().split(".")
+            self.orders.append((name, "desc" in flags))
+        return self
+
+    def limit(self, size: int, *, foreign_table: Optional[str] = None):
+        self.limit_count = size
+        return self
+
+    def range(self, start: int, end: int):
+        # End-exclusive, like the pinned postgrest-py
+        self.offset, self.limit_count = start, end - start
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    def execute(self) -> MemoryResponse:
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        with self.client.lock:
+            return self.client.run(self)
+
+class MemoryAuth:
+    def __init__(self, client: "MemoryClient"):
+        self.client = client
+
+    def get_user(self, token: str):
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        claims = jwt.get_unverified_claims(token)
+        return SimpleNamespace(user=SimpleNamespace(id=claims["sub"], email=claims.get("email")))
+
+class MemoryClient:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.tables: Dict[str, MemoryTable] = {}
+        self.views: Dict[str, Callable[["MemoryClient"], List[dict]]] = {}
+        self.auth = MemoryAuth(self)
+
+    def table(self, name: str) -> MemoryQuery:
+        return MemoryQuery(self, name)
+
+    from_ = table
+
+    def register_view(self, name: str, rows: Callable[["MemoryClient"], List[dict]]):
+        self.views[name] = rows
+
+    def get_table(self, name: str) -> MemoryTable:
+        if name not in self.tables:
+            self.tables[name] = MemoryTable(name)
+        return self.tables[name]
+
+    def seed(self, name: str, rows: List[dict]):
+        """Bulk-load rows without the per-call latency (ids/created_at filled in as on insert)."""
+        with self.lock:
+            table = self.get_table(name)
+            for row in rows:
+                table.add(self._with_defaults(row))
+
+    def _with_defaults(self, row: dict) -> dict:
+        row = dict(row)
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        return row
+
+    # Query execution
+    def run(self, query: MemoryQuery) -> MemoryResponse:
+        if query.http_method == "POST":
+            return self._insert(query)
+        rows, presorted = self._matching_rows(query)
+        if query.http_method == "PATCH":
+            table = self.get_table(query.table)
+            updated = []
+            for row in list(rows):
+                table.remove(row)
+                new_row = {**row, **query.payload}
+                table.add(new_row)
+                updated.append(new_row)
+            return MemoryResponse([] if query.returning_minimal else updated)
+        if query.http_method == "DELETE":
+            table = self.get_table(query.table)
+            rows = list(rows)
+            for row in rows:
+                table.remove(row)
+            return MemoryResponse([] if query.returning_minimal else rows)
+        return self._select(query, rows, presorted)
+
+    def _insert(self, query: MemoryQuery) -> MemoryResponse:
+        table = self.get_table(query.table)
+        upsert = "merge-duplicates" in query.headers.get("Prefer", "")
+        inserted = []
+        # Like PostgREST, a multi-row body writes the first row's columns; keys missing from later rows become null
+        columns = list(query.payload[0]) if query.payload else []
+        for row in query.payload:
+            row = {column: row.get(column) for column in columns}
+            existing = table.rows.get(row.get("id")) if row.get("id") is not None else None
+            if existing is not None and not upsert:
+                raise MemoryAPIError(f"duplicate key value violates unique constraint \"{query.table}_pkey\"")
+            if existing is not None:
+                table.remove(existing)
+                row = {**existing, **row}
+            row = self._with_defaults(row)
+            table.add(row)
+            inserted.append(row)
+        return MemoryResponse([] if query.returning_minimal else inserted)
+
+    def _candidates(self, query: MemoryQuery):
+        """Rows that may match, and whether they already come in the query's order."""
+        if query.table in self.views:
+            return self.views[query.table](self), False
+        table = self.get_table(query.table)
+        # Narrow with a hash index when there is a plain equality filter
+        for column, op, value, negate in (c for c in query.conditions if len(c) == 4):
+            if op == "eq" and not negate:
+                if column == "id":
+                    row = table.rows.get(str(value))
+                    return ([row] if row else []), False
+                return [table.rows[row_id] for row_id in table.index(column).get(value, ())], False
+        # Walk the (created_at, id) index newest first, starting at any upper bound on created_at
+        if query.orders and query.orders[:2] in ([("created_at", True)], [("created_at", True), ("id", True)]):
+            keys = table.created_index
+            bound = _upper_bound(("and", query.conditions), "created_at")
+            end = bisect.bisect_right(keys, bound, key=lambda k: k[0]) if bound is not None else len(keys)
+            return (table.rows[keys[i][1]] for i in range(end - 1, -1, -1)), len(query.orders) <= 2
+        return table.rows.values(), False
+
+    def _matching_rows(self, query: MemoryQuery):
+        rows, presorted = self._candidates(query)
+        return (row for row in rows if all(_matches(row, c) for c in query.conditions)), presorted
+
+    def _select(self, query: MemoryQuery, rows, presorted: bool) -> MemoryResponse:
+        count = None
+        if query.count_method:
+            rows = list(rows)
+            count = len(rows)
+        if query.orders and not presorted:
+            rows = list(rows)
+            for column, descending in reversed(query.orders):
+                rows.sort(key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else ""), reverse=descending)
+        if query.offset or query.limit_count is not None:
+            end = None if query.limit_count is None else query.offset + query.limit_count
+            rows = list(islice(rows, query.offset, end))
+        data = [self._project(query, row) for row in rows]
+        if query.is_single:
+            if len(data) != 1:
+                raise MemoryAPIError(f"JSON object requested, multiple (or no) rows returned ({len(data)})")
+            return MemoryResponse(data[0], count)
+        return MemoryResponse(data, count)
+
+    def _project(self, query: MemoryQuery, row: dict) -> dict:
+        result = {}
+        for item in _split_top_level(query.columns):
+            match = re.match(r"^(\w+)\((.*)\)$", item, re.S)
+            if item == "*":
+                result.update(row)
+            elif match:
+                relation, columns = match.groups()
+                result[relation] = self._embed(query, row, relation, columns)
+            else:
+                result[item] = row.get(item)
+        return result
+
+    def _embed(self, query: MemoryQuery, row: dict, relation: str, columns: str) -> Optional[dict]:
+        # Many-to-one only: roles(name) follows role_id, permissions(name) follows permission_id
+        foreign_key = f"{relation[:-1] if relation.endswith('s') else relation}_id"
+        target = self.get_table(relation).rows.get(row.get(foreign_key))
+        if target is None:
+            return None
+        embedded = self._project(MemoryQuery(self, relation).select(columns), target)
+        for column, op, value, negate in query.embed_conditions:
+            embedded_relation, embedded_column = column.split(".", 1)
+            if embedded_relation == relation and not _matches(target, (embedded_column, op, value, negate)):
+                return None
+        return embedded
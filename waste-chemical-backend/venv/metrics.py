@@ -0,0 +1,189 @@
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # Optional; only needed for PROFILE_SLOW_REQUESTS_MS
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+# --- Metrics ---
+# Minimal Prometheus text-format registry. Observations happen on the event loop, so no locking.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Sequence[Tuple[str, object]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        self.values[labelvalues] = self.values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(list(zip(self.labelnames, labelvalues)))} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, tuple(labelnames), tuple(buckets)
+        self.series: Dict[tuple, list] = {}  # labelvalues -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labelvalues):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labelvalues, series in sorted(self.series.items()):
+            labels = list(zip(self.labelnames, labelvalues))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+class GaugeCallback:
+    """Gauge whose samples are read from `collect()` at scrape time: {labelvalues tuple: value}."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], collect: Callable[[], Dict[tuple, float]]):
+        self.name, self.help, self.labelnames, self.collect = name, help, tuple(labelnames), collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labelvalues, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(list(zip(self.labelnames, labelvalues)))} {value}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+request_duration = registry.register(Histogram("http_request_duration_seconds", "Request latency by route", ("method", "route", "status")))
+response_size = registry.register(Histogram("http_response_size_bytes", "Response body size by route", ("method", "route"), SIZE_BUCKETS))
+upstream_calls_per_request = registry.register(Histogram("upstream_calls_per_request", "Supabase calls made while serving a request", ("method", "route"), COUNT_BUCKETS))
+upstream_duration = registry.register(Histogram("upstream_request_duration_seconds", "Supabase call latency by table and operation", ("table", "operation")))
+upstream_errors = registry.register(Counter("upstream_errors_total", "Failed Supabase calls by table and operation", ("table", "operation")))
+
+# --- Upstream Call Tracking ---
+_request_upstream_calls: ContextVar[Optional[list]] = ContextVar("request_upstream_calls", default=None)
+
+def describe_query(query) -> Tuple[str, str]:
+    path = getattr(query, "path", "") or ""
+    method = (getattr(query, "http_method", "") or "").upper()
+    prefer = str((getattr(query, "headers", None) or {}).get("Prefer", ""))
+    operation = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}.get(method, method.lower() or "unknown")
+    if operation == "insert" and "resolution=merge-duplicates" in prefer:
+        operation = "upsert"
+    if path.startswith("/rpc/"):
+        operation = "rpc"
+    return path.strip("/").split("?")[0] or "unknown", operation
+
+def observe_upstream(query, seconds: float, failed: bool = False):
+    observe_upstream_call(*describe_query(query), seconds, failed)
+
+def observe_upstream_call(table: str, operation: str, seconds: float, failed: bool = False):
+    upstream_duration.observe(seconds, table, operation)
+    if failed:
+        upstream_errors.inc(table, operation)
+    calls = _request_upstream_calls.get()
+    if calls is not None:
+        calls[0] += 1
+
+# --- Middleware ---
+PROFILE_SLOW_REQUESTS_MS = float(os.getenv("PROFILE_SLOW_REQUESTS_MS", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request and counting its response bytes and upstream calls.
+
+    When PROFILE_SLOW_REQUESTS_MS is set (and pyinstrument is installed), a PROFILE_SAMPLE_RATE
+    fraction of requests run under the sampling profiler; profiles of requests slower than the
+    threshold are written to PROFILE_DIR.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict[Callable, str]] = None
+        if PROFILE_SLOW_REQUESTS_MS and Profiler is None:
+            logger.warning("PROFILE_SLOW_REQUESTS_MS is set but pyinstrument is not installed; profiling disabled")
+
+    def _route_path(self, scope) -> str:
+        if self._route_paths is None:
+            self._route_paths = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        calls = [0]
+        token = _request_upstream_calls.set(calls)
+        state = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        profiler = None
+        if PROFILE_SLOW_REQUESTS_MS and Profiler is not None and random.random() < PROFILE_SAMPLE_RATE:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_upstream_calls.reset(token)
+            method, route = scope["method"], self._route_path(scope)
+            request_duration.observe(elapsed, method, route, str(state["status"]))
+            response_size.observe(state["bytes"], method, route)
+            upstream_calls_per_request.observe(calls[0], method, route)
+            if profiler is not None:
+                profiler.stop()
+                if elapsed * 1000 >= PROFILE_SLOW_REQUESTS_MS:
+                    self._save_profile(profiler, method, route, elapsed)
+
+    def _save_profile(self, profiler, method: str, route: str, elapsed: float):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{method}-{route.strip('/').replace('/', '_') or 'root'}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_text())
+        logger.warning(f"Slow request {method} {route} took {elapsed * 1000:.0f}ms; profile saved to {path}")
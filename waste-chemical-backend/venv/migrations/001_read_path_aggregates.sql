@@ -0,0 +1,17 @@
+-- Read-path support for /api/dashboard/stats and /api/notifications.
+
+-- Chemicals at or below their reorder level. Comparing two columns of the same row cannot be
+-- expressed as a PostgREST filter, so the view lets the database do it instead of the API.
+create or replace view public.chemical_low_stock
+with (security_invoker = true) as
+select id, name, category, quantity, reorder_level, location, created_at
+from public.chemical
+where reorder_level is not null and quantity <= reorder_level;
+
+-- Indexes backing the dashboard counts and the notification queries.
+create index if not exists chemical_expiration_date_idx on public.chemical (expiration_date);
+create index if not exists waste_status_idx on public.waste (status);
+
+-- Keyset pagination on (created_at, id) for the list and export endpoints.
+create index if not exists waste_created_at_id_idx on public.waste (created_at desc, id desc);
+create index if not exists chemical_created_at_id_idx on public.chemical (created_at desc, id desc);
@@ -0,0 +1,16 @@
+-- Grouped counts for /api/analytics.
+
+-- One row per (month, status, category) and (month, category) bucket, so an analytics rebuild reads
+-- a few hundred groups instead of paging through every row. Months are taken in UTC, matching the
+-- created_at prefix the API uses when it applies write deltas.
+create or replace view public.waste_rollup
+with (security_invoker = true) as
+select to_char(created_at at time zone 'UTC', 'YYYY-MM') as month, status, category, count(*)::int as row_count
+from public.waste
+group by 1, 2, 3;
+
+create or replace view public.chemical_rollup
+with (security_invoker = true) as
+select to_char(created_at at time zone 'UTC', 'YYYY-MM') as month, category, count(*)::int as row_count
+from public.chemical
+group by 1, 2;
@@ -0,0 +1,79 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+import db
+
+# --- Keyset Pagination ---
+# Rows are ordered newest first on (created_at, id). A cursor encodes the last row of a page, so
+# fetching the next page is an indexed range scan no matter how deep the client has paged.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000
+KEYSET_COLUMNS = ("created_at", "id")
+
+def select_columns(fields: Optional[str], allowed: Iterable[str]) -> str:
+    if not fields:
+        return "*"
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # The keyset columns are always returned so every page can produce the next cursor
+    return ",".join(dict.fromkeys(requested + list(KEYSET_COLUMNS)))
+
+def encode_cursor(row: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps([row["created_at"], row["id"]]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    # The values end up inside a PostgREST filter, so they must be a real timestamp and row id
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        datetime.fromisoformat(created_at)
+        return created_at, str(uuid.UUID(row_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def apply_cursor(query, cursor: str):
+    created_at, row_id = decode_cursor(cursor)
+    filters = f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+    if hasattr(query, "or_"):
+        return query.or_(filters)
+    # postgrest-py 0.13 (pinned by supabase 2.0.2) has no or_(); add the PostgREST `or` parameter directly
+    query.params = query.params.add("or", f"({filters})")
+    return query
+
+def order_keyset(query):
+    # One combined order parameter: postgrest-py 0.13 adds a separate `order` param per .order() call,
+    # and PostgREST only honours one of them, which would drop the id tiebreak.
+    return query.order("created_at.desc,id", desc=True)
+
+async def fetch_page(build_query: Callable, columns: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    query = build_query(columns)
+    if cursor:
+        query = apply_cursor(query, cursor)
+    # One extra row tells us whether another page exists without a separate count query
+    response = await db.execute(order_keyset(query).limit(limit + 1))
+    rows = response.data or []
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+async def iter_pages(build_query: Callable, columns: str, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[List[dict]]:
+    cursor = None
+    while True:
+        rows, cursor = await fetch_page(build_query, columns, chunk_size, cursor)
+        if rows:
+            yield rows
+        if not cursor:
+            break
+
+def ndjson_response(build_query: Callable, columns: str, filename: Optional[str] = None) -> StreamingResponse:
+    async def body():
+        async for rows in iter_pages(build_query, columns):
+            yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'} if filename else None
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=headers)
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import pytest
+
+# The app configures its backend and caches at import time, so the environment is set before any
+# test module imports it. Tests run against the in-memory backend (see memory_backend.py).
+WORKDIR = tempfile.mkdtemp(prefix="waste-chemical-tests-")
+os.environ.update({
+    "DB_BACKEND": "memory",
+    "DB_SIMULATED_LATENCY_MS": "0",
+    "SUPABASE_JWT_SECRET": "test-secret",
+    "SUPABASE_JWKS_URL": "",
+    "ACTIVITY_LOG_JOURNAL": os.path.join(WORKDIR, "activity_journal.jsonl"),
+    "EXPORT_DIR": WORKDIR,
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+PERMISSIONS = ["waste:read", "waste:create", "waste:update", "waste:delete",
+               "chemicals:read", "chemicals:create", "chemicals:update", "chemicals:delete", "admin:manage_users"]
+
+@pytest.fixture(scope="session")
+def api():
+    """Send a request to the app in-process as an admin user: api("GET", "/api/waste", params=...)."""
+    import httpx
+    from jose import jwt
+    import db
+    import main
+
+    db.supabase.seed("permissions", [{"id": f"perm-{i}", "name": name} for i, name in enumerate(PERMISSIONS)])
+    db.supabase.seed("roles", [{"id": "role-admin", "name": "admin"}])
+    db.supabase.seed("role_permissions", [{"id": f"rp-{i}", "role_id": "role-admin", "permission_id": f"perm-{i}"} for i in range(len(PERMISSIONS))])
+    db.supabase.seed("user_profiles", [{"id": USER_ID, "email": "test@example.com", "role_id": "role-admin"}])
+    token = jwt.encode({"sub": USER_ID, "email": "test@example.com", "aud": "authenticated", "exp": int(time.time()) + 3600},
+                       "test-secret", algorithm="HS256")
+
+    def request(method: str, path: str, **kwargs):
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test",
+                                         headers={"Authorization": f"Bearer {token}"}) as http:
+                return await http.request(method, path, **kwargs)
+        return asyncio.run(send())
+    return request
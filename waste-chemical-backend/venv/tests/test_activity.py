@@ -0,0 +1,164 @@
+import asyncio
+import glob
+import json
+import os
+import time
+import activity
+from activity import ActivityLogger
+import db
+
+def entries(n):
+    return [{"user_id": "u1", "action": "Created Waste", "details": {"n": i}} for i in range(n)]
+
+def journal_rows(path):
+    with open(path, encoding="utf-8") as journal:
+        return [json.loads(line) for line in journal]
+
+async def hang(query):
+    await asyncio.sleep(3600)
+
+async def fail(query):
+    raise RuntimeError("database unreachable")
+
+def write_journal(path, lines):
+    with open(path, "a", encoding="utf-8") as journal:
+        journal.writelines(line + "\n" for line in lines)
+
+async def replay_and_stop(logger):
+    await logger.start()
+    await logger._replay_task
+    await logger.stop()
+
+async def log_and_stop(logger, logged):
+    await logger.start()
+    for entry in logged:
+        logger.log(entry)
+    await logger.stop()
+
+def test_batches_entries_into_one_insert(tmp_path):
+    table = db.supabase.get_table("activity_log")
+    before = len(table.rows)
+    logger = ActivityLogger(flush_interval=0.01, journal_path=str(tmp_path / "journal.jsonl"))
+    asyncio.run(log_and_stop(logger, entries(5)))
+
+    assert len(table.rows) == before + 5
+    assert (logger.flushes, logger.flushed_rows, logger.spilled_rows) == (1, 5, 0)
+
+def test_stop_journals_batch_in_flight_when_drain_times_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(activity.db, "execute", hang)
+    logger = ActivityLogger(flush_interval=0.01, drain_timeout=0.1, journal_path=str(tmp_path / "journal.jsonl"))
+
+    async def scenario():
+        await logger.start()
+        for entry in entries(5):
+            logger.log(entry)
+        await asyncio.sleep(0.05)  # Let the worker take the batch off the queue
+        await logger.stop()
+    asyncio.run(scenario())
+
+    assert len(journal_rows(logger.journal_path)) == 5
+    assert logger.spilled_rows == 5
+
+def test_failed_flush_spills_to_journal_and_replays_on_next_start(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.jsonl")
+    with monkeypatch.context() as patch:
+        patch.setattr(activity.db, "execute", fail)
+        failing = ActivityLogger(flush_interval=0.01, max_retries=2, retry_base_delay=0, journal_path=path)
+        asyncio.run(log_and_stop(failing, entries(3)))
+    assert [row["details"]["n"] for row in journal_rows(path)] == [0, 1, 2]
+    assert failing.failed_attempts == 2
+
+    table = db.supabase.get_table("activity_log")
+    before = len(table.rows)
+    replaying = ActivityLogger(journal_path=path)
+
+    async def replay():
+        await replaying.start()
+        await replaying._replay_task
+        await replaying.stop()
+    asyncio.run(replay())
+
+    assert len(table.rows) == before + 3
+    assert replaying.replayed_rows == 3
+    assert not os.path.exists(path) and not glob.glob(f"{path}.replay*")
+
+def test_replay_does_not_block_startup_and_keeps_entries_on_shutdown(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.jsonl")
+    with open(path, "w", encoding="utf-8") as journal:
+        journal.writelines(json.dumps(entry) + "\n" for entry in entries(4))
+    monkeypatch.setattr(activity.db, "execute", hang)
+    logger = ActivityLogger(drain_timeout=0.1, journal_path=path)
+
+    async def scenario():
+        started = time.perf_counter()
+        await logger.start()
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.05)
+        await logger.stop()
+        return elapsed
+    assert asyncio.run(scenario()) < 0.05
+
+    assert len(journal_rows(path)) == 4
+    assert not glob.glob(f"{path}.replay*")
+
+def test_torn_journal_line_is_quarantined_and_the_rest_replayed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    lines = [json.dumps(entry) for entry in entries(3)]
+    write_journal(path, lines + [lines[0][:17]])  # Crash mid-write leaves a partial last line
+    table = db.supabase.get_table("activity_log")
+    before = len(table.rows)
+
+    logger = ActivityLogger(journal_path=path)
+    asyncio.run(replay_and_stop(logger))
+
+    assert len(table.rows) == before + 3
+    with open(f"{path}.rejected", encoding="utf-8") as rejected:
+        assert rejected.read() == lines[0][:17] + "\n"
+    assert not os.path.exists(path) and not glob.glob(f"{path}.replay*")
+
+def test_rows_the_database_rejects_do_not_hold_back_the_rest(tmp_path, monkeypatch):
+    execute = db.execute
+
+    async def reject_poison(query):
+        if any(row.get("details", {}).get("poison") for row in getattr(query, "payload", None) or []):
+            raise RuntimeError("invalid input syntax")
+        return await execute(query)
+    monkeypatch.setattr(activity.db, "execute", reject_poison)
+    path = str(tmp_path / "journal.jsonl")
+    logged = entries(10)
+    logged[5]["details"] = {"poison": True}
+    write_journal(path, [json.dumps(entry) for entry in logged])
+    table = db.supabase.get_table("activity_log")
+    before = len(table.rows)
+
+    logger = ActivityLogger(batch_size=4, max_retries=1, journal_path=path)
+    asyncio.run(replay_and_stop(logger))
+
+    assert len(table.rows) == before + 9
+    assert [json.loads(line)["details"] for line in open(f"{path}.rejected", encoding="utf-8")] == [{"poison": True}]
+    assert not os.path.exists(path)
+
+def test_outage_keeps_every_entry_for_the_next_startup(tmp_path, monkeypatch):
+    monkeypatch.setattr(activity.db, "execute", fail)
+    path = str(tmp_path / "journal.jsonl")
+    write_journal(path, [json.dumps(entry) for entry in entries(6)])
+
+    asyncio.run(replay_and_stop(ActivityLogger(batch_size=2, max_retries=1, journal_path=path)))
+
+    assert [row["details"]["n"] for row in journal_rows(path)] == list(range(6))
+    assert not os.path.exists(f"{path}.rejected")
+
+def test_concurrent_workers_replay_each_entry_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(db.supabase, "latency", 0.01)
+    path = str(tmp_path / "journal.jsonl")
+    write_journal(path, [json.dumps(entry) for entry in entries(50)])
+    write_journal(f"{path}.replay", [json.dumps(entry) for entry in entries(5)])  # Left by a crashed worker
+    table = db.supabase.get_table("activity_log")
+    before = len(table.rows)
+
+    async def two_workers():
+        await asyncio.gather(*(replay_and_stop(ActivityLogger(batch_size=10, journal_path=path)) for _ in range(2)))
+    asyncio.run(two_workers())
+
+    assert len(table.rows) == before + 55
+    assert not os.path.exists(path) and not glob.glob(f"{path}.replay*")
@@ -0,0 +1,102 @@
+import asyncio
+import time
+import db
+from analytics import AnalyticsRollup
+
+def table_totals():
+    return {"waste": len(db.supabase.get_table("waste").rows), "chemicals": len(db.supabase.get_table("chemical").rows)}
+
+def test_record_applies_create_update_and_delete_deltas(api):
+    rollup = AnalyticsRollup()
+    asyncio.run(rollup.rebuild())
+    before = rollup.snapshot()
+    etag = rollup.etag()
+
+    row = {"created_at": "2031-05-02T10:00:00+00:00", "status": "pending", "category": "RollupTest"}
+    rollup.record("waste", new=row)
+    rollup.record("waste", old=row, new={**row, "status": "disposed"})
+    after = rollup.snapshot()
+    assert after["totals"]["waste"] == before["totals"]["waste"] + 1
+    assert {"month": "2031-05", "waste": 1, "chemicals": 0} in after["monthly"]
+    assert {"name": "RollupTest", "value": 1} in after["waste_by_category"]
+    statuses = {b["name"]: b["value"] for b in after["waste_by_status"]}
+    assert statuses["disposed"] == {b["name"]: b["value"] for b in before["waste_by_status"]}.get("disposed", 0) + 1
+    assert rollup.etag() != etag
+
+    rollup.record("waste", old={**row, "status": "disposed"})
+    assert rollup.snapshot() == before
+
+def test_readers_see_previous_counters_until_rebuild_completes(api, monkeypatch):
+    db.supabase.seed("chemical", [{"name": f"Rollup {i}", "category": "RollupTest", "quantity": 1,
+                                   "created_at": f"2024-02-01T00:00:{i:02d}+00:00"} for i in range(10)])
+    rollup = AnalyticsRollup()
+    asyncio.run(rollup.rebuild())
+    expected = table_totals()
+    assert rollup.snapshot()["totals"] == expected
+    monkeypatch.setattr(db.supabase, "latency", 0.02)
+
+    async def scenario():
+        rebuild = asyncio.create_task(rollup.rebuild())
+        await asyncio.sleep(0.03)  # First table scanned, second still in flight
+        await rollup.ensure_fresh()
+        during = rollup.snapshot()["totals"]
+        rollup.record("chemicals", new={"created_at": "2031-06-01T00:00:00+00:00", "category": "RollupTest"})
+        await rebuild
+        return during
+    during = asyncio.run(scenario())
+
+    assert during == expected
+    assert rollup.snapshot()["totals"] == {"waste": expected["waste"], "chemicals": expected["chemicals"] + 1}
+
+def test_stale_read_serves_previous_build_while_rebuilding(api, monkeypatch):
+    rollup = AnalyticsRollup(max_age=0)
+    asyncio.run(rollup.rebuild())
+    built = rollup.build_id
+    monkeypatch.setattr(db.supabase, "latency", 0.05)
+
+    async def scenario():
+        started = time.perf_counter()
+        await rollup.ensure_fresh()
+        waited = time.perf_counter() - started
+        served = rollup.build_id
+        await rollup._task
+        return waited, served
+    waited, served = asyncio.run(scenario())
+
+    assert waited < 0.05 and served == built
+    assert rollup.build_id != built
+
+def test_invalidate_during_rebuild_forces_another(api, monkeypatch):
+    rollup = AnalyticsRollup()
+    monkeypatch.setattr(db.supabase, "latency", 0.02)
+
+    async def scenario():
+        rebuild = asyncio.create_task(rollup.rebuild())
+        await asyncio.sleep(0.01)
+        rollup.invalidate()  # e.g. a bulk import finished while the views were read
+        await rebuild
+        return rollup.is_fresh()
+    assert asyncio.run(scenario()) is False
+    asyncio.run(rollup.rebuild())
+    assert rollup.is_fresh()
+
+def test_writes_before_their_table_is_read_are_not_counted_twice(api, monkeypatch):
+    db.supabase.seed("chemical", [{"id": f"rollup-del-{i}", "name": f"Rollup del {i}", "category": "RollupDelete", "quantity": 1,
+                                   "created_at": "2024-03-01T00:00:00+00:00"} for i in range(3)])
+    rollup = AnalyticsRollup()
+    asyncio.run(rollup.rebuild())
+    monkeypatch.setattr(db.supabase, "latency", 0.02)
+
+    async def scenario():
+        rebuild = asyncio.create_task(rollup.rebuild())
+        await asyncio.sleep(0.01)  # Waste view in flight; the chemical view is not read yet
+        table = db.supabase.get_table("chemical")
+        row = table.rows["rollup-del-0"]
+        table.remove(row)
+        rollup.record("chemicals", old=row)
+        await rebuild
+    asyncio.run(scenario())
+
+    assert rollup.is_fresh()
+    assert rollup.snapshot()["totals"] == table_totals()
+    assert {"name": "RollupDelete", "value": 2} in rollup.snapshot()["chemicals_by_category"]
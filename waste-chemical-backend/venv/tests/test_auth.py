@@ -0,0 +1,147 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+from cache import TTLCache
+import db
+from conftest import USER_ID
+
+def pem_pair(private_key):
+    private = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    public = private_key.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return private, public
+
+RSA_PRIVATE, RSA_PUBLIC = pem_pair(rsa.generate_private_key(public_exponent=65537, key_size=2048))
+EC_PRIVATE, EC_PUBLIC = pem_pair(ec.generate_private_key(ec.SECP256R1()))
+RSA_JWK = {**jwk.construct(RSA_PUBLIC, "RS256").to_dict(), "kid": "rsa-1"}
+EC_JWK = {**jwk.construct(EC_PUBLIC, "ES256").to_dict(), "kid": "ec-1"}
+
+def token(key, algorithm: str, kid: str, **claims) -> str:
+    claims = {"sub": USER_ID, "email": "test@example.com", "aud": "authenticated", "exp": int(time.time()) + 600, **claims}
+    return jwt.encode(claims, key, algorithm=algorithm, headers={"kid": kid})
+
+def forged_hs256(secret: bytes, kid: str) -> str:
+    # jose refuses to HMAC-sign with a PEM key, so build the key-confusion token by hand
+    def segment(data: dict) -> bytes:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=")
+    signing_input = segment({"alg": "HS256", "typ": "JWT", "kid": kid}) + b"." + segment(
+        {"sub": USER_ID, "aud": "authenticated", "exp": int(time.time()) + 600})
+    signature = base64.urlsafe_b64encode(hmac.new(secret, signing_input, hashlib.sha256).digest()).rstrip(b"=")
+    return (signing_input + b"." + signature).decode()
+
+@pytest.fixture
+def jwks_server(monkeypatch):
+    """Serves `keys` from the JWKS URL and records every fetch."""
+    import main
+    server = {"keys": [RSA_JWK, EC_JWK], "fetches": 0, "status": 200, "delay": 0.0}
+
+    def fake_get(url, timeout):
+        server["fetches"] += 1
+        time.sleep(server["delay"])
+        return httpx.Response(server["status"], json={"keys": server["keys"]}, request=httpx.Request("GET", url))
+    monkeypatch.setattr(httpx, "get", fake_get)
+    monkeypatch.setattr(main, "SUPABASE_JWKS_URL", "http://jwks.test/.well-known/jwks.json")
+    monkeypatch.setattr(main, "jwks_cache", TTLCache(maxsize=1, ttl=3600))
+    monkeypatch.setattr(main, "jwks_fetched_at", 0.0)
+    monkeypatch.setattr(main, "jwks_lock", asyncio.Lock())
+    return server
+
+def authenticate(bearer: str):
+    import main
+    try:
+        return asyncio.run(main.get_current_user(f"Bearer {bearer}")).id
+    except HTTPException as e:
+        return e.status_code
+
+def test_rsa_and_ec_keys_verify_with_their_algorithm(jwks_server):
+    assert authenticate(token(RSA_PRIVATE, "RS256", "rsa-1")) == USER_ID
+    assert authenticate(token(EC_PRIVATE, "ES256", "ec-1")) == USER_ID
+    assert jwks_server["fetches"] == 1
+
+def test_algorithm_is_not_chosen_by_the_token(jwks_server):
+    # HS256 "signed" with the public key: accepted if the header picked the algorithm
+    assert authenticate(forged_hs256(RSA_PUBLIC, "rsa-1")) == 401
+    assert authenticate(token(RSA_PRIVATE, "RS512", "rsa-1")) == 401
+    # An RSA signature presented under the EC key's kid
+    assert authenticate(token(RSA_PRIVATE, "RS256", "ec-1")) == 401
+
+def test_unsupported_key_type_is_rejected(jwks_server):
+    jwks_server["keys"] = [{"kty": "oct", "kid": "oct-1", "k": "c2VjcmV0"}]
+    assert authenticate(token("secret", "HS256", "oct-1")) == 401
+
+def test_malformed_and_expired_tokens_are_401(jwks_server):
+    assert authenticate("not.a.jwt") == 401
+    assert authenticate(token(RSA_PRIVATE, "RS256", "rsa-1", exp=int(time.time()) - 10)) == 401
+    assert authenticate(token(RSA_PRIVATE, "RS256", "rsa-1", aud="someone-else")) == 401
+
+def test_jwks_fetch_failure_is_503(jwks_server):
+    jwks_server["status"] = 500
+    assert authenticate(token(RSA_PRIVATE, "RS256", "rsa-1")) == 503
+
+def test_unknown_kid_refetches_at_most_once_per_interval(jwks_server, monkeypatch):
+    import main
+    unknown = token(RSA_PRIVATE, "RS256", "rotated")
+    for _ in range(5):
+        assert authenticate(unknown) == 401
+    assert jwks_server["fetches"] == 1  # Cold fetch only: the refetch interval has not passed
+
+    monkeypatch.setattr(main, "jwks_fetched_at", time.monotonic() - main.JWKS_MIN_REFRESH_INTERVAL)
+    jwks_server["keys"] = [{**RSA_JWK, "kid": "rotated"}]
+    assert authenticate(unknown) == USER_ID
+    assert authenticate(unknown) == USER_ID
+    assert jwks_server["fetches"] == 2
+
+def test_cold_jwks_is_fetched_once_for_concurrent_requests(jwks_server):
+    import main
+    jwks_server["delay"] = 0.05
+    bearer = token(RSA_PRIVATE, "RS256", "rsa-1")
+
+    async def burst():
+        return await asyncio.gather(*(main.get_current_user(f"Bearer {bearer}") for _ in range(10)))
+    assert {user.id for user in asyncio.run(burst())} == {USER_ID}
+    assert jwks_server["fetches"] == 1
+
+@pytest.fixture
+def remote_auth(monkeypatch):
+    """Fall back to Supabase Auth (no secret, no JWKS) and count its get_user calls."""
+    import main
+    calls = []
+    get_user = db.supabase_auth.auth.get_user
+    monkeypatch.setattr(main, "SUPABASE_JWT_SECRET", None)
+    monkeypatch.setattr(main, "SUPABASE_JWKS_URL", None)
+    monkeypatch.setattr(main, "token_cache", TTLCache(maxsize=16, ttl=60))
+    monkeypatch.setattr(db.supabase_auth.auth, "get_user", lambda bearer: calls.append(bearer) or get_user(bearer))
+    return calls
+
+def test_remote_auth_caches_tokens_until_they_expire(remote_auth):
+    import main
+    long_lived = token("unused", "HS256", "k", exp=int(time.time()) + 3600)
+    assert authenticate(long_lived) == authenticate(long_lived) == USER_ID
+    assert len(remote_auth) == 1
+
+    short_lived = token("unused", "HS256", "k", exp=int(time.time()) + 2)
+    assert authenticate(short_lived) == USER_ID
+    assert main.token_cache._data[short_lived][0] - time.monotonic() <= 2
+
+    expired = token("unused", "HS256", "k", exp=int(time.time()) - 1)
+    assert authenticate(expired) == authenticate(expired) == USER_ID  # Supabase would reject it; never cached
+    assert len(remote_auth) == 4
+
+def test_role_update_evicts_cached_role(api):
+    import main
+    db.supabase.seed("roles", [{"id": "role-viewer", "name": "viewer"}])
+    db.supabase.seed("user_profiles", [{"id": "user-2", "email": "two@example.com", "role_id": "role-admin"}])
+    main.user_role_cache.set("user-2", "role-admin")
+
+    response = api("PUT", "/api/admin/users/user-2", json={"role_id": "role-viewer"})
+
+    assert response.status_code == 200
+    assert main.user_role_cache.get("user-2") is None
@@ -0,0 +1,61 @@
+import asyncio
+import db
+from bulk import iter_csv_rows
+
+async def collect(chunks):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+    return [row async for row in iter_csv_rows(stream())]
+
+def test_csv_rows_survive_any_chunk_boundary():
+    data = '\ufeffname,category,quantity,location\nAcetone,Solvent,2,"Cabinet 3\nshelf ""B"""\n\n\u00c9thanol,Solvent,1.5,\n'.encode()
+    expected = [
+        {"name": "Acetone", "category": "Solvent", "quantity": "2", "location": 'Cabinet 3\nshelf "B"'},
+        {"name": "\u00c9thanol", "category": "Solvent", "quantity": "1.5", "location": ""},
+    ]
+    assert asyncio.run(collect([data])) == expected
+    # One byte at a time splits the BOM, a multi-byte character and the quoted newline across chunks
+    assert asyncio.run(collect([data[i:i + 1] for i in range(len(data))])) == expected
+
+def test_csv_without_trailing_newline_keeps_last_row():
+    assert asyncio.run(collect([b"name,quantity\nA,1\nB,2"])) == [{"name": "A", "quantity": "1"}, {"name": "B", "quantity": "2"}]
+
+def test_csv_import_applies_defaults_for_empty_cells(api):
+    body = "name,category,quantity,status,location\nBulk default,Plastic,3,,\nBulk collected,Metal,4,collected,Bay 1\nBulk bad,Metal,lots,,\n"
+    response = api("POST", "/api/waste/bulk", content=body, headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["received"], report["inserted"], report["failed"]) == (3, 2, 1)
+    assert report["errors"][0]["row"] == 3
+    rows = {r["name"]: r for r in db.supabase.get_table("waste").rows.values() if r["name"].startswith("Bulk ")}
+    assert rows["Bulk default"]["status"] == "pending" and rows["Bulk default"]["location"] is None
+    assert rows["Bulk collected"]["status"] == "collected"
+
+def test_json_import_rejects_malformed_body(api):
+    response = api("POST", "/api/waste/bulk", content="[{", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    response = api("POST", "/api/waste/bulk", json={"name": "not a list"})
+    assert response.status_code == 400
+
+def test_partial_upsert_keeps_unsent_columns_and_owner(api):
+    db.supabase.seed("waste", [
+        {"id": "w-upsert-1", "name": "Drum", "category": "Metal", "quantity": 1, "status": "disposed",
+         "certificate_file_path": "certs/drum.pdf", "location": "Bay 4", "user_id": "owner-9"},
+        {"id": "w-upsert-2", "name": "Crate", "category": "Wood", "quantity": 1, "status": "collected",
+         "location": "Yard", "user_id": "owner-9"},
+    ])
+    body = [
+        {"id": "w-upsert-1", "name": "Drum", "category": "Metal", "quantity": 7},
+        # A different key set: in one batch PostgREST would null the first row's location
+        {"id": "w-upsert-2", "name": "Crate", "category": "Wood", "quantity": 2, "location": "Bay 5"},
+    ]
+    report = api("POST", "/api/waste/bulk", json=body).json()
+
+    assert (report["upserted"], report["failed"]) == (2, 0)
+    rows = db.supabase.get_table("waste").rows
+    drum, crate = rows["w-upsert-1"], rows["w-upsert-2"]
+    assert (drum["quantity"], drum["status"], drum["certificate_file_path"], drum["location"]) == (7, "disposed", "certs/drum.pdf", "Bay 4")
+    assert (crate["quantity"], crate["status"], crate["location"]) == (2, "collected", "Bay 5")
+    assert drum["user_id"] == crate["user_id"] == "owner-9"
@@ -0,0 +1,63 @@
+import asyncio
+import csv
+import io
+from functools import partial
+import db
+from conftest import USER_ID
+from exports import ExportJobs, export_jobs
+
+def seed_waste(count: int, category: str):
+    db.supabase.seed("waste", [{"name": f"{category} {i}", "category": category, "quantity": i, "status": "pending",
+                                "user_id": USER_ID, "created_at": f"2024-01-01T00:00:{i:02d}+00:00"} for i in range(count)])
+
+def test_csv_export_streams_every_matching_row(api):
+    seed_waste(25, "ExportCsv")
+    response = api("GET", "/api/exports/waste", params={"category": "ExportCsv"})
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 25
+    assert rows[0]["name"] == "ExportCsv 24"  # Newest first
+
+def test_chemical_export_rejects_status_filter(api):
+    assert api("GET", "/api/exports/chemicals", params={"status": "pending"}).status_code == 400
+    assert api("POST", "/api/exports/chemicals/pdf", params={"status": "pending"}).status_code == 400
+
+def test_pdf_job_state_is_visible_to_other_workers(api):
+    import main
+    seed_waste(30, "ExportPdf")
+
+    async def run_job():
+        job = export_jobs.start(USER_ID, partial(main.waste_query, category="ExportPdf"), "Waste Report",
+                                main.EXPORT_PDF_COLUMNS["waste"], "waste_report.pdf")
+        await job["task"]
+        return job
+    job = asyncio.run(run_job())
+
+    other_worker = ExportJobs()
+    state = other_worker.get(job["id"], USER_ID)
+    assert (state["status"], state["rows"]) == ("done", 30)
+    with open(state["path"], "rb") as f:
+        assert f.read(5) == b"%PDF-"
+    assert other_worker.get(job["id"], "another-user") is None
+    assert other_worker.get("../" + job["id"], USER_ID) is None
+
+def test_cancelled_pdf_job_is_marked_failed(api, monkeypatch):
+    import exports
+    import main
+
+    async def stalled_pages(build_query, columns):
+        await asyncio.sleep(3600)
+        yield []
+    monkeypatch.setattr(exports, "iter_pages", stalled_pages)
+
+    async def cancel_job():
+        job = export_jobs.start(USER_ID, main.waste_query, "Waste Report", main.EXPORT_PDF_COLUMNS["waste"], "waste_report.pdf")
+        await asyncio.sleep(0.05)
+        job["task"].cancel()
+        await asyncio.gather(job["task"], return_exceptions=True)
+        return job
+    job = asyncio.run(cancel_job())
+
+    state = ExportJobs().get(job["id"], USER_ID)
+    assert state["status"] == "failed"
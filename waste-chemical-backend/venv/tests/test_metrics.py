@@ -0,0 +1,31 @@
+import metrics
+from cache import TTLCache
+
+def upstream_count(table: str, operation: str) -> int:
+    series = metrics.upstream_duration.series.get((table, operation))
+    return series[-1] if series else 0
+
+def calls_per_request(route: str) -> tuple:
+    series = metrics.upstream_calls_per_request.series.get(("GET", route))
+    return (series[-2], series[-1]) if series else (0, 0)
+
+def test_supabase_auth_calls_count_as_upstream_calls(api, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "SUPABASE_JWT_SECRET", None)  # Fall back to Supabase Auth
+    monkeypatch.setattr(main, "token_cache", TTLCache(ttl=0))
+    api("GET", "/api/user/profile")  # Warm the permission caches
+    get_user_before = upstream_count("auth", "get_user")
+    calls_before, requests_before = calls_per_request("/api/user/profile")
+
+    assert api("GET", "/api/user/profile").status_code == 200
+
+    calls_after, requests_after = calls_per_request("/api/user/profile")
+    assert upstream_count("auth", "get_user") == get_user_before + 1
+    assert (calls_after - calls_before, requests_after - requests_before) == (2, 1)  # get_user + profile
+
+def test_metrics_endpoint_renders_request_and_upstream_series(api):
+    api("GET", "/api/waste", params={"limit": 5})
+    body = api("GET", "/metrics").text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/waste",status="200"}' in body
+    assert 'upstream_request_duration_seconds_count{table="waste",operation="select"}' in body
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+import db
+from conftest import USER_ID
+
+def rows(table: str) -> list:
+    return list(db.supabase.get_table(table).rows.values())
+
+def expected_stats() -> dict:
+    soon = (date.today() + timedelta(days=30)).isoformat()
+    return {
+        "total_waste": len(rows("waste")),
+        "total_chemicals": len(rows("chemical")),
+        "expiring_chemicals": sum(1 for r in rows("chemical") if r.get("expiration_date") and r["expiration_date"] <= soon),
+        "pending_waste": sum(1 for r in rows("waste") if r.get("status") == "pending"),
+    }
+
+def fresh_stats(api) -> dict:
+    import main
+    main.read_cache.clear()
+    return api("GET", "/api/dashboard/stats").json()
+
+def seed_read_path_rows():
+    today = date.today()
+    db.supabase.seed("chemical", [
+        {"name": "Low Acid", "category": "Acid", "quantity": 2, "reorder_level": 5, "expiration_date": (today + timedelta(days=400)).isoformat(), "user_id": USER_ID},
+        {"name": "Stocked Base", "category": "Base", "quantity": 50, "reorder_level": 5, "expiration_date": (today + timedelta(days=400)).isoformat(), "user_id": USER_ID},
+        {"name": "Expiring Buffer", "category": "Buffer", "quantity": 9, "reorder_level": None, "expiration_date": (today + timedelta(days=3)).isoformat(), "user_id": USER_ID},
+    ])
+    db.supabase.seed("waste", [
+        {"name": "Pending Drum", "category": "Metal", "quantity": 1, "status": "pending", "user_id": USER_ID},
+        {"name": "Disposed Drum", "category": "Metal", "quantity": 1, "status": "disposed", "user_id": USER_ID},
+    ])
+
+def test_count_queries_return_counts_without_rows(api):
+    seed_read_path_rows()
+    response = db.supabase.table("waste").select("id", count="exact").eq("status", "pending").limit(1).execute()
+    assert len(response.data) <= 1
+    assert response.count == expected_stats()["pending_waste"]
+
+def test_dashboard_stats_match_seeded_data(api):
+    seed_read_path_rows()
+    assert fresh_stats(api) == expected_stats()
+
+def test_notifications_use_the_low_stock_view(api):
+    import main
+    seed_read_path_rows()
+    main.read_cache.clear()
+    messages = {n["message"] for n in api("GET", "/api/notifications").json()}
+
+    assert "'Low Acid' is low on stock." in messages
+    assert "'Stocked Base' is low on stock." not in messages
+    assert "'Expiring Buffer' is expiring soon." in messages
+    assert "'Pending Drum' is pending collection." in messages
+    assert not any("Disposed Drum" in m for m in messages)
+
+def test_writes_are_visible_on_the_next_poll(api):
+    before = fresh_stats(api)
+    api("GET", "/api/notifications")  # Both responses are now cached
+
+    created = api("POST", "/api/waste", json={"name": "Poll Drum", "category": "Metal", "quantity": 2}).json()
+    stats = api("GET", "/api/dashboard/stats").json()
+    assert (stats["total_waste"], stats["pending_waste"]) == (before["total_waste"] + 1, before["pending_waste"] + 1)
+    assert "'Poll Drum' is pending collection." in {n["message"] for n in api("GET", "/api/notifications").json()}
+
+    api("PUT", f"/api/waste/{created['id']}", json={"status": "collected"})
+    stats = api("GET", "/api/dashboard/stats").json()
+    assert (stats["total_waste"], stats["pending_waste"]) == (before["total_waste"] + 1, before["pending_waste"])
+
+    api("DELETE", f"/api/waste/{created['id']}")
+    assert api("GET", "/api/dashboard/stats").json() == before
+
+    api("POST", "/api/chemicals/bulk", json=[{"name": f"Poll Reagent {i}", "category": "Reagent", "quantity": 1} for i in range(3)])
+    assert api("GET", "/api/dashboard/stats").json()["total_chemicals"] == before["total_chemicals"] + 3
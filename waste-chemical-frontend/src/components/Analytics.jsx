@@ -8,54 +8,27 @@ import { format, parseISO } from 'date-fns'
 const Analytics = () => {
   // ... (state and other functions)
   const [loading, setLoading] = useState(true)
-  const [data, setData] = useState({ waste: [], chemicals: [] })
+  const [data, setData] = useState({ totals: { waste: 0, chemicals: 0 }, monthly: [], waste_by_status: [], chemicals_by_category: [] })
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [wasteRes, chemicalRes] = await Promise.all([api.get('/api/waste'), api.get('/api/chemicals')])
-        setData({ waste: wasteRes.data || [], chemicals: chemicalRes.data || [] })
+        // Rollups are maintained server-side, so the payload scales with the number of buckets, not rows
+        const response = await api.get('/api/analytics')
+        setData(response.data)
       } catch (error) { console.error('Failed to fetch analytics data', error) }
       finally { setLoading(false) }
     }
     fetchData()
   }, [])
 
-  const processMonthlyData = () => {
-    const monthlyData = {}
-    const allItems = [...(data.waste || []), ...(data.chemicals || [])]
-    allItems.forEach((item) => {
-      if (item.created_at) {
-        // FIX: Explicitly parse the timestamp string
-        const month = format(parseISO(item.created_at), 'MMM yyyy')
-        if (!monthlyData[month]) {
-          monthlyData[month] = { name: month, waste: 0, chemicals: 0 }
-        }
-        if (item.hasOwnProperty('sds_link')) {
-          monthlyData[month].chemicals += 1
-        } else {
-          monthlyData[month].waste += 1
-        }
-      }
-    })
-    return Object.values(monthlyData).sort((a, b) => new Date(a.name) - new Date(b.name))
-  }
-  // ... (rest of the component is the same)
-  const getWasteStatusData = () => {
-    const statusCounts = (data.waste || []).reduce((acc, item) => {
-      acc[item.status] = (acc[item.status] || 0) + 1
-      return acc
-    }, {})
-    return Object.entries(statusCounts).map(([name, value]) => ({ name: name.charAt(0).toUpperCase() + name.slice(1), value }))
-  }
+  const processMonthlyData = () =>
+    data.monthly.map(({ month, waste, chemicals }) => ({ name: format(parseISO(`${month}-01`), 'MMM yyyy'), waste, chemicals }))
 
-  const getChemicalCategoryData = () => {
-    const categoryCounts = (data.chemicals || []).reduce((acc, item) => {
-      acc[item.category] = (acc[item.category] || 0) + 1
-      return acc
-    }, {})
-    return Object.entries(categoryCounts).map(([name, value]) => ({ name, value }))
-  }
+  const getWasteStatusData = () =>
+    data.waste_by_status.map(({ name, value }) => ({ name: name.charAt(0).toUpperCase() + name.slice(1), value }))
+
+  const getChemicalCategoryData = () => data.chemicals_by_category
 
   const COLORS = ['#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6']
 
@@ -64,9 +37,9 @@ const Analytics = () => {
   return (
     <div className="space-y-6">
       <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
-        <StatCard title="Total Waste Items" value={data.waste.length} icon={Package} color="green" />
-        <StatCard title="Total Chemicals" value={data.chemicals.length} icon={Beaker} color="blue" />
-        <StatCard title="Pending Waste" value={data.waste.filter((w) => w.status === 'pending').length} icon={Clock} color="yellow" />
+        <StatCard title="Total Waste Items" value={data.totals.waste} icon={Package} color="green" />
+        <StatCard title="Total Chemicals" value={data.totals.chemicals} icon={Beaker} color="blue" />
+        <StatCard title="Pending Waste" value={data.waste_by_status.find((s) => s.name === 'pending')?.value || 0} icon={Clock} color="yellow" />
       </div>
       <ChartCard title="Monthly Activity">
         <ResponsiveContainer width="100%" height={300}>
@@ -4,6 +4,7 @@ import Papa from 'papaparse'
 import { motion } from 'framer-motion'
 import { X, Upload, File, CheckCircle, AlertCircle, Loader } from 'lucide-react'
 import toast from 'react-hot-toast'
+import api from '../lib/api'
 
 const CSVImporter = ({ isOpen, onClose, onImport, requiredFields, endpoint }) => {
   const [file, setFile] = useState(null)
@@ -32,11 +33,17 @@ const CSVImporter = ({ isOpen, onClose, onImport, requiredFields, endpoint }) =>
   }
 
   const parseFile = (fileToParse) => {
+    // With a server endpoint the server parses and validates the file; only read enough for a preview
     Papa.parse(fileToParse, {
       header: true,
       skipEmptyLines: true,
+      preview: endpoint ? 10 : 0,
       complete: (results) => {
-        validateData(results.data)
+        if (endpoint) {
+          setParsedData(results.data)
+        } else {
+          validateData(results.data)
+        }
       },
     })
   }
@@ -69,9 +76,22 @@ const CSVImporter = ({ isOpen, onClose, onImport, requiredFields, endpoint }) =>
     setImporting(true)
     toast.loading("Importing data...")
     try {
-      await onImport(parsedData)
-      toast.dismiss()
-      toast.success(`${parsedData.length} items imported successfully!`)
+      if (endpoint) {
+        // The server streams the raw file, validates each row and writes in batches
+        const { data: report } = await api.post(endpoint, file, { headers: { 'Content-Type': 'text/csv' } })
+        toast.dismiss()
+        if (report.failed > 0) {
+          setErrors(report.errors.map((err) => `Row ${err.row + 1}: ${err.error}`))
+          toast.error(`${report.inserted + report.upserted} items imported, ${report.failed} failed.`)
+          return
+        }
+        toast.success(`${report.inserted + report.upserted} items imported successfully!`)
+        onImport?.(report)
+      } else {
+        await onImport(parsedData)
+        toast.dismiss()
+        toast.success(`${parsedData.length} items imported successfully!`)
+      }
       handleClose()
     } catch (error) {
       toast.dismiss()
@@ -141,7 +161,7 @@ const CSVImporter = ({ isOpen, onClose, onImport, requiredFields, endpoint }) =>
                   </tbody>
                 </table>
               </div>
-              <p className="text-xs text-gray-500 mt-2">Showing preview of the first 10 rows. Found {parsedData.length} total rows.</p>
+              <p className="text-xs text-gray-500 mt-2">Showing preview of the first 10 rows.{!endpoint && ` Found ${parsedData.length} total rows.`}</p>
             </div>
           )}
 
@@ -149,7 +169,7 @@ const CSVImporter = ({ isOpen, onClose, onImport, requiredFields, endpoint }) =>
             <button onClick={handleClose} className="px-4 py-2 text-sm font-medium text-gray-700 dark:text-gray-300 bg-white dark:bg-gray-700 border border-gray-300 dark:border-gray-600 rounded-lg hover:bg-gray-50 dark:hover:bg-gray-600 transition-colors">Cancel</button>
             <button onClick={handleImport} disabled={!file || errors.length > 0 || importing} className="px-4 py-2 text-sm font-medium text-white bg-indigo-600 hover:bg-indigo-700 dark:bg-indigo-700 dark:hover:bg-indigo-600 border border-transparent rounded-lg transition-colors disabled:opacity-50 disabled:cursor-not-allowed flex items-center">
               {importing ? <Loader className="animate-spin h-4 w-4 mr-2" /> : <CheckCircle className="h-4 w-4 mr-2" />}
-              {importing ? 'Importing...' : `Import ${parsedData.length} Items`}
+              {importing ? 'Importing...' : endpoint ? 'Import File' : `Import ${parsedData.length} Items`}
             </button>
           </div>
         </div>
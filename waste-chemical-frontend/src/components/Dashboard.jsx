@@ -6,7 +6,7 @@ import api from '../lib/api'
 import { Trash2, Beaker, AlertTriangle, Clock, Eye, Download, RefreshCw } from 'lucide-react'
 import jsPDF from 'jspdf'
 import 'jspdf-autotable'
-import { format } from 'date-fns'
+import { format, parseISO } from 'date-fns'
 import toast from 'react-hot-toast'
 
 const Dashboard = () => {
@@ -20,33 +20,17 @@ const Dashboard = () => {
   const fetchDashboardData = async () => {
     try {
       setRefreshing(true)
-      const [statsResponse, wasteResponse, chemicalResponse] = await Promise.all([
+      const [statsResponse, analyticsResponse] = await Promise.all([
         api.get('/api/dashboard/stats'),
-        api.get('/api/waste'),
-        api.get('/api/chemicals')
+        api.get('/api/analytics')
       ])
 
       setStats(statsResponse.data)
 
-      const wasteData = wasteResponse.data || []
-      const wasteCategoryData = wasteData.reduce((acc, item) => {
-        acc[item.category] = (acc[item.category] || 0) + 1
-        return acc
-      }, {})
-      const wasteCategories = Object.entries(wasteCategoryData).map(([category, count]) => ({ category, count, value: count }))
-
-      const chemicalData = chemicalResponse.data || []
-      const chemicalCategoryData = chemicalData.reduce((acc, item) => {
-        acc[item.category] = (acc[item.category] || 0) + 1
-        return acc
-      }, {})
-      const chemicalCategories = Object.entries(chemicalCategoryData).map(([category, count]) => ({ category, count, value: count }))
-
-      const monthlyTrends = [
-        { month: 'Jan', waste: 45, chemicals: 32 }, { month: 'Feb', waste: 52, chemicals: 41 },
-        { month: 'Mar', waste: 48, chemicals: 38 }, { month: 'Apr', waste: 61, chemicals: 45 },
-        { month: 'May', waste: 55, chemicals: 42 }, { month: 'Jun', waste: 67, chemicals: 49 },
-      ]
+      const analytics = analyticsResponse.data
+      const wasteCategories = analytics.waste_by_category.map(({ name, value }) => ({ category: name, count: value, value }))
+      const chemicalCategories = analytics.chemicals_by_category.map(({ name, value }) => ({ category: name, count: value, value }))
+      const monthlyTrends = analytics.monthly.slice(-6).map(({ month, waste, chemicals }) => ({ month: format(parseISO(`${month}-01`), 'MMM'), waste, chemicals }))
 
       setChartData({ wasteCategories, chemicalCategories, monthlyTrends })
     } catch (error) {
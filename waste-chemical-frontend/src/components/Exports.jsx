@@ -3,9 +3,11 @@ import { motion } from 'framer-motion'
 import api from '../lib/api'
 import toast from 'react-hot-toast'
 import { Download, FileText, FileSpreadsheet, Calendar } from 'lucide-react'
-import jsPDF from 'jspdf'
-import 'jspdf-autotable'
-import Papa from 'papaparse'
+
+// Roughly ten minutes of polling before giving up on a PDF job
+const PDF_POLL_INITIAL_DELAY = 1000
+const PDF_POLL_MAX_DELAY = 5000
+const PDF_POLL_MAX_ATTEMPTS = 125
 
 const Exports = () => {
   const [reportType, setReportType] = useState('waste')
@@ -16,28 +18,15 @@ const Exports = () => {
   const handleExport = async () => {
     setLoading(true)
     try {
-      const response = await api.get(`/api/${reportType}`)
-      let data = response.data || []
-
-      // Filter by date range if specified
-      if (dateRange.from && dateRange.to) {
-        const from = new Date(dateRange.from)
-        const to = new Date(dateRange.to)
-        data = data.filter((item) => {
-          const itemDate = new Date(item.created_at)
-          return itemDate >= from && itemDate <= to
-        })
-      }
-
-      if (data.length === 0) {
-        toast.error('No data found for the selected criteria.')
-        return
-      }
+      // The date range is filtered by the API, which streams the report instead of the whole table
+      const params = {}
+      if (dateRange.from) params.date_from = dateRange.from
+      if (dateRange.to) params.date_to = dateRange.to
 
       if (format === 'csv') {
-        exportCSV(data)
+        await exportCSV(params)
       } else {
-        exportPDF(data)
+        await exportPDF(params)
       }
     } catch (error) {
       toast.error('Failed to generate report.')
@@ -47,55 +36,46 @@ const Exports = () => {
     }
   }
 
-  const exportCSV = (data) => {
-    const csv = Papa.unparse(data)
-    const blob = new Blob([csv], { type: 'text/csv;charset=utf-8;' })
+  const downloadBlob = (blob, filename) => {
     const link = document.createElement('a')
     link.href = URL.createObjectURL(blob)
-    link.setAttribute('download', `${reportType}_report.csv`)
+    link.setAttribute('download', filename)
     document.body.appendChild(link)
     link.click()
     document.body.removeChild(link)
-    toast.success('CSV report downloaded.')
+    URL.revokeObjectURL(link.href)
   }
 
-  const exportPDF = (data) => {
-    const doc = new jsPDF()
-    const tableColumns =
-      reportType === 'waste'
-        ? ['Name', 'Category', 'Quantity', 'Status', 'Collection Date']
-        : ['Name', 'Category', 'Quantity', 'Expiration Date', 'Location']
-    const tableRows = data.map((item) =>
-      reportType === 'waste'
-        ? [
-            item.name,
-            item.category,
-            item.quantity,
-            item.status,
-            item.collection_date || 'N/A',
-          ]
-        : [
-            item.name,
-            item.category,
-            item.quantity,
-            item.expiration_date || 'N/A',
-            item.location || 'N/A',
-          ]
-    )
+  const exportCSV = async (params) => {
+    const response = await api.get(`/api/exports/${reportType}`, { params: { ...params, format: 'csv' }, responseType: 'blob' })
+    const text = await response.data.text()
+    if (text.trim().split('\n').length <= 1) {
+      toast.error('No data found for the selected criteria.')
+      return
+    }
+    downloadBlob(response.data, `${reportType}_report.csv`)
+    toast.success('CSV report downloaded.')
+  }
 
-    doc.autoTable({
-      head: [tableColumns],
-      body: tableRows,
-      startY: 20,
-    })
-    doc.text(
-      `${
-        reportType.charAt(0).toUpperCase() + reportType.slice(1)
-      } Report`,
-      14,
-      15
-    )
-    doc.save(`${reportType}_report.pdf`)
+  const exportPDF = async (params) => {
+    // Large PDFs are rendered by a background job on the server; poll with backoff until it finishes
+    const { data: started } = await api.post(`/api/exports/${reportType}/pdf`, null, { params })
+    let job = started
+    let delay = PDF_POLL_INITIAL_DELAY
+    for (let attempt = 0; job.status === 'pending' || job.status === 'running'; attempt++) {
+      if (attempt >= PDF_POLL_MAX_ATTEMPTS) throw new Error('Timed out waiting for the PDF report')
+      await new Promise((resolve) => setTimeout(resolve, delay))
+      delay = Math.min(delay * 2, PDF_POLL_MAX_DELAY)
+      const { data: polled } = await api.get(`/api/exports/jobs/${job.id}`)
+      job = polled
+    }
+    if (job.status === 'failed') throw new Error(job.error)
+    if (job.rows === 0) {
+      toast.error('No data found for the selected criteria.')
+      return
+    }
+    const response = await api.get(`/api/exports/jobs/${job.id}/download`, { responseType: 'blob' })
+    downloadBlob(response.data, job.filename)
     toast.success('PDF report downloaded.')
   }
 